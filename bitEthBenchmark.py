@@ -0,0 +1,322 @@
+"""Offline benchmark for the bitEthTool.py investigation pipeline.
+
+Runs every pipeline stage against a synthetic, in-process stand-in for the
+blockchain APIs, so no network access or API key is needed. Each scenario
+records wall time, CPU time and peak traced memory per stage and writes one
+JSON document that can be compared against an earlier run:
+
+    python bitEthBenchmark.py --nodes 1000 10000 --output bench.json
+    python bitEthBenchmark.py --nodes 1000 10000 --compare bench.json
+"""
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")  # never open a window while benchmarking
+
+import argparse
+import contextlib
+import json
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+import bitEthTool as tool
+
+BENCHMARK_VERSION = 1
+STAGES = ("trace", "mixers", "cycles", "patterns", "risk", "clustering", "centrality", "communities",
+          "visualisation", "report")
+
+# Synthetic Blockchain API
+class SyntheticAPI(tool.BlockchainAPI):
+    """Deterministic Etherscan-shaped transaction graph served from memory.
+
+    ``nodes`` addresses exchange ``nodes * avg_degree`` transactions. With
+    ``distribution="powerlaw"`` senders and receivers are drawn with Zipf-like
+    weights (exponent ``alpha``), giving the hub-and-spoke shape of exchange and
+    mixer wallets; ``"uniform"`` draws them evenly. Every page request sleeps
+    ``latency`` seconds plus up to ``jitter`` seconds to stand in for the network.
+    """
+    provider = "synthetic"
+    provider_name = "Synthetic API"
+    max_page_size = 10000
+
+    def __init__(self, nodes=1000, avg_degree=5.0, distribution="powerlaw", alpha=1.2, latency=0.0, jitter=0.0,
+                 seed=42):
+        super().__init__(cache=None, transport=None)
+        if distribution not in ("powerlaw", "uniform"):
+            raise ValueError(f"Unknown degree distribution: {distribution}")
+        self.latency = latency
+        self.jitter = jitter
+        self.addresses = [f"0x{i:040x}" for i in range(nodes)]
+        self._address_ids = {address: i for i, address in enumerate(self.addresses)}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+        rng = np.random.default_rng(seed)
+        count = int(nodes * avg_degree)
+        if distribution == "powerlaw":
+            weights = 1.0 / np.arange(1, nodes + 1) ** alpha
+            weights /= weights.sum()
+            self.senders = rng.choice(nodes, size=count, p=weights)
+            # Shuffle receiver ranks so the busiest senders are not also the busiest receivers.
+            self.receivers = rng.permutation(nodes)[rng.choice(nodes, size=count, p=weights)]
+        else:
+            self.senders = rng.integers(0, nodes, size=count)
+            self.receivers = rng.integers(0, nodes, size=count)
+        self.timestamps = 1_600_000_000 + np.sort(rng.integers(0, 365 * 86400, size=count))
+        self.gwei = rng.lognormal(mean=np.log(1e8), sigma=2.0, size=count).astype(np.int64) + 1
+
+        # Per-address transaction indices, newest first, as the explorers return them.
+        owners = np.concatenate([self.senders, self.receivers])
+        indices = np.concatenate([np.arange(count), np.arange(count)])
+        order = np.lexsort((-indices, owners))
+        self._tx_indices = indices[order]
+        self._offsets = np.searchsorted(owners[order], np.arange(nodes + 1))
+
+    @property
+    def transactions(self):
+        return len(self.senders)
+
+    def busiest_address(self):
+        """The address with the most transactions, a natural worst-case trace seed."""
+        return self.addresses[int(np.argmax(np.diff(self._offsets)))]
+
+    def _tx(self, i):
+        return {
+            "hash": f"0x{i:064x}",
+            "from": self.addresses[self.senders[i]],
+            "to": self.addresses[self.receivers[i]],
+            "value": str(int(self.gwei[i]) * 10**9),
+            "timeStamp": str(self.timestamps[i]),
+            "blockNumber": str(10_000_000 + i),
+            "nonce": str(i),
+            "confirmations": "12",
+        }
+
+    def _wait(self):
+        tool.PipelineMetrics.shared().count("api_calls", provider=self.provider, source="network")
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def get_address_page(self, address, page_number, page_size):
+        self._wait()
+        address_id = self._address_ids.get(address)
+        if address_id is None:
+            return []
+        start = self._offsets[address_id] + page_number * page_size
+        end = min(start + page_size, self._offsets[address_id + 1])
+        return [self._tx(int(i)) for i in self._tx_indices[start:end]]
+
+    def get_transaction_info(self, txid):
+        self._wait()
+        i = int(txid, 16)
+        return self._tx(i) if 0 <= i < self.transactions else None
+
+    def get_exchange_rates(self):
+        return {"usd": {"value": 60000.0}, "inr": {"value": 5000000.0}, "eth": {"value": 20.0}}
+
+# Stage Measurement
+class StageTimer:
+    """Collects wall time, CPU time and peak traced memory for named stages."""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            result = {"wall_seconds": time.perf_counter() - wall, "cpu_seconds": time.process_time() - cpu}
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                result["peak_memory_bytes"] = peak - baseline
+                result["retained_memory_bytes"] = current - baseline
+            self.stages[name] = result
+
+def _peak_rss_bytes():
+    """Peak resident set size of this process, or None where ``resource`` is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+# Benchmark Scenarios
+def scenario_name(config):
+    return f"{config['distribution']}-n{config['nodes']}-d{config['avg_degree']:g}-depth{config['depth']}"
+
+def run_pipeline(api, config, workdir, trace_memory=True):
+    """Run every pipeline stage once on a fresh case.
+
+    Returns the per-stage measurements, graph sizes and the tool's own ``PipelineMetrics`` snapshot.
+    """
+    timer = StageTimer(trace_memory)
+    address = api.busiest_address()
+    case = tool.InvestigationCase("benchmark", [address], api.get_exchange_rates())
+    investigator = tool.CryptoInvestigator(api, tool.KYCAMLData(), graph_backend=config["graph_backend"])
+    visualizer = tool.EnhancedGraphVisualizer(investigator, layout_cache_dir=None)
+    calls_before = api.calls
+    tool.PipelineMetrics.shared().reset()
+
+    with timer.stage("trace"):
+        investigator.trace_transactions(address, case, depth=config["depth"], limit=config["limit"],
+                                        workers=config["trace_workers"], progress=False)
+    with timer.stage("mixers"):
+        mixers = investigator.detect_mixers_or_tumblers()
+    with timer.stage("cycles"):
+        cycles = investigator.detect_circular_transactions()
+    with timer.stage("patterns"):
+        patterns = tool.PatternDetector().detect(case.store)
+    with timer.stage("risk"):
+        risk_scores = tool.RiskEngine().score(case, mixers, patterns)
+    with timer.stage("clustering"):
+        clusters = tool.AddressClusterAnalyzer(investigator).identify_clusters()
+    with timer.stage("centrality"):
+        graph_metrics = visualizer.analyze_graph_metrics(mode=config["analytics"], workers=config["workers"])
+    with timer.stage("communities"):
+        communities = visualizer.detect_communities()
+    graph_file = os.path.join(workdir, "graph.png")
+    with timer.stage("visualisation"):
+        visualizer.visualize(save_as=graph_file, show=False, dpi=config["dpi"])
+    with timer.stage("report"):
+        tool.InvestigationReportGenerator(case, clusters, risk_scores, graph_metrics, communities, mixers,
+                                          cycles, patterns).generate_report(
+            graph_file, filename=os.path.join(workdir, "report.pdf"))
+
+    return timer.stages, {
+        "transactions": len(case.store),
+        "nodes": investigator.graph.number_of_nodes(),
+        "edges": investigator.graph.number_of_edges(),
+        "api_calls": api.calls - calls_before,
+        "mixers": len(mixers),
+        "cycles": len(cycles),
+        "communities": len(communities),
+    }, tool.PipelineMetrics.shared().snapshot()
+
+def run_scenario(config, repeat=1, trace_memory=True):
+    """Run one scenario ``repeat`` times, keeping the fastest wall time per stage."""
+    api = SyntheticAPI(nodes=config["nodes"], avg_degree=config["avg_degree"],
+                       distribution=config["distribution"], alpha=config["alpha"],
+                       latency=config["latency"], jitter=config["jitter"], seed=config["seed"])
+    best, graph, pipeline_metrics = {}, None, None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            stages, graph, pipeline_metrics = run_pipeline(api, config, workdir, trace_memory)
+        for name, result in stages.items():
+            if name not in best or result["wall_seconds"] < best[name]["wall_seconds"]:
+                best[name] = result
+    return {
+        "name": scenario_name(config),
+        "config": config,
+        "graph": graph,
+        "stages": best,
+        "pipeline_metrics": pipeline_metrics,
+        "total_wall_seconds": sum(result["wall_seconds"] for result in best.values()),
+        "peak_memory_bytes": max((result.get("peak_memory_bytes", 0) for result in best.values()), default=0),
+    }
+
+def compare(results, baseline, tolerance=0.2, min_seconds=0.05):
+    """Stages that got more than ``tolerance`` slower than in ``baseline``, as readable lines.
+
+    Stages faster than ``min_seconds`` in both runs are ignored; their timings are mostly noise.
+    """
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in results["scenarios"]:
+        old = previous.get(scenario["name"])
+        if old is None:
+            continue
+        for name, result in scenario["stages"].items():
+            before = old["stages"].get(name, {}).get("wall_seconds")
+            after = result["wall_seconds"]
+            if before is None or max(before, after) < min_seconds:
+                continue
+            if after > before * (1 + tolerance):
+                regressions.append(f"{scenario['name']} {name}: {before:.3f}s -> {after:.3f}s "
+                                   f"({(after / before - 1) * 100 if before else float('inf'):+.0f}%)")
+    return regressions
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the bitEthTool pipeline against a synthetic API.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000], help="graph sizes to benchmark")
+    parser.add_argument("--avg-degree", type=float, default=5.0, help="transactions per address (default: 5)")
+    parser.add_argument("--distribution", choices=("powerlaw", "uniform"), default="powerlaw",
+                        help="degree distribution of the synthetic graph")
+    parser.add_argument("--alpha", type=float, default=1.2, help="power-law exponent (default: 1.2)")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per API call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per API call")
+    parser.add_argument("--depth", type=int, default=2, help="tracing depth (default: 2)")
+    parser.add_argument("--limit", type=int, default=50, help="transactions fetched per address (default: 50)")
+    parser.add_argument("--trace-workers", type=int, default=4, help="concurrent address lookups")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="centrality worker processes")
+    parser.add_argument("--analytics", choices=("exact", "approx"), default="approx", help="centrality mode")
+    parser.add_argument("--graph-backend", choices=("networkx", "csr"), default="csr")
+    parser.add_argument("--dpi", type=int, default=150, help="graph image resolution")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; the fastest is kept")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip tracemalloc (faster, but no per-stage memory figures)")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown per stage before --compare fails (default: 0.2)")
+    return parser
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    trace_memory = not args.no_memory
+    if trace_memory:
+        tracemalloc.start()
+
+    scenarios = []
+    for nodes in args.nodes:
+        config = {"nodes": nodes, "avg_degree": args.avg_degree, "distribution": args.distribution,
+                  "alpha": args.alpha, "latency": args.latency, "jitter": args.jitter, "depth": args.depth,
+                  "limit": args.limit, "trace_workers": args.trace_workers, "workers": args.workers,
+                  "analytics": args.analytics, "graph_backend": args.graph_backend, "dpi": args.dpi,
+                  "seed": args.seed}
+        print(f"Running {scenario_name(config)}...", file=sys.stderr)
+        scenarios.append(run_scenario(config, repeat=max(1, args.repeat), trace_memory=trace_memory))
+
+    results = {
+        "benchmark_version": BENCHMARK_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "tracemalloc": trace_memory,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "scenarios": scenarios,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    for scenario in scenarios:
+        timings = ", ".join(f"{name} {scenario['stages'][name]['wall_seconds']:.2f}s" for name in STAGES)
+        print(f"{scenario['name']}: {timings}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), tolerance=args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
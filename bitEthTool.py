@@ -1,100 +1,752 @@
 import requests
 import networkx as nx
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 from fpdf import FPDF
 from fpdf.enums import XPos, YPos
 from datetime import datetime
+import argparse
+import contextlib
+import cProfile
+import csv
+import functools
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import pickle
+import random
 import re
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from array import array
+from collections.abc import Mapping
 import networkx.algorithms.centrality as centrality
 from networkx.algorithms.community import greedy_modularity_communities
-# import random
+import numpy as np
+try:
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:  # SciPy is optional; CSRGraph falls back to NumPy loops
+    sparse = csgraph = None
+
+logger = logging.getLogger("bitEthTool")
+
+# Structured Logging and Pipeline Instrumentation
+_LOG_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JSONLogFormatter(logging.Formatter):
+    """One JSON object per record; fields passed with ``extra=`` become top-level keys."""
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _LOG_RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level="INFO", fmt="text"):
+    """Send the tool's log records to stderr as plain messages or JSON lines."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONLogFormatter() if fmt == "json" else logging.Formatter("%(message)s"))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+class PipelineMetrics:
+    """Per-stage wall/CPU time plus labelled counters and gauges for one investigation.
+
+    Stages may nest; memory peaks (``trace_memory``) and the cProfile profiler
+    (``profile``) cover outermost stages on the main thread. Counters are fed by
+    the transport (requests, bytes), the response cache (hits, misses) and the
+    APIs; ``snapshot`` derives hit ratios, and the result can be exported as
+    JSON or Prometheus text.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, profile=False, trace_memory=False):
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def shared(cls):
+        """Process-wide metrics used by the instrumented pipeline methods."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def install(cls, metrics):
+        """Make ``metrics`` the process-wide instance, e.g. to enable profiling."""
+        with cls._shared_lock:
+            cls._shared = metrics
+        return metrics
+
+    def reset(self):
+        """Forget everything recorded so far, including profiler statistics."""
+        with self._lock:
+            if self.profiler is not None:
+                self.profiler = cProfile.Profile()
+            self.stages = {}
+            self.counters = {}
+            self.gauges = {}
+            self.started = time.time()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block as stage ``name``; repeated stages accumulate."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        outermost = depth == 0 and threading.current_thread() is threading.main_thread()
+        if outermost and self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        if outermost and self.profiler is not None:
+            self.profiler.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if outermost and self.profiler is not None:
+                self.profiler.disable()
+            peak = tracemalloc.get_traced_memory()[1] - memory_start if outermost and self.trace_memory else None
+            self._local.depth = depth
+            with self._lock:
+                stats = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+                stats["calls"] += 1
+                stats["wall_seconds"] += wall
+                stats["cpu_seconds"] += cpu
+                if peak is not None:
+                    stats["peak_memory_bytes"] = max(stats.get("peak_memory_bytes", 0), peak)
+            logger.debug("Stage %s finished in %.3fs", name, wall,
+                         extra={"stage": name, "wall_seconds": round(wall, 6), "cpu_seconds": round(cpu, 6)})
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def counter_total(self, name, **labels):
+        """Sum of counter ``name`` over all label sets matching ``labels``."""
+        with self._lock:
+            return sum(value for (counter, counter_labels), value in self.counters.items()
+                       if counter == name and set(labels.items()) <= set(counter_labels))
+
+    def snapshot(self):
+        """JSON-serialisable view of everything recorded so far."""
+        hits = self.counter_total("cache_lookups", result="hit")
+        lookups = self.counter_total("cache_lookups")
+        with self._lock:
+            return {
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "stages": {name: dict(stats) for name, stats in self.stages.items()},
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "gauges": dict(self.gauges),
+                "api_calls": sum(value for (name, _), value in self.counters.items() if name == "api_calls"),
+                "bytes_downloaded": sum(value for (name, _), value in self.counters.items()
+                                        if name == "http_bytes"),
+                "cache_hit_ratio": hits / lookups if lookups else None,
+            }
+
+    def merge(self, snapshot):
+        """Add another run's ``snapshot()`` (e.g. from a batch worker) into this one."""
+        with self._lock:
+            for name, stats in snapshot.get("stages", {}).items():
+                total = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+                for key, value in stats.items():
+                    total[key] = max(total.get(key, 0), value) if key == "peak_memory_bytes" \
+                        else total.get(key, 0) + value
+            for counter in snapshot.get("counters", []):
+                key = (counter["name"], tuple(sorted(counter["labels"].items())))
+                self.counters[key] = self.counters.get(key, 0) + counter["value"]
+            for name, value in snapshot.get("gauges", {}).items():
+                self.gauges[name] = self.gauges.get(name, 0) + value
+
+    def to_prometheus(self, prefix="bitethtool"):
+        """Prometheus text exposition format."""
+        snapshot = self.snapshot()
+
+        def labels(pairs):
+            return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"'
+                                  for key, value in pairs) + "}" if pairs else ""
+
+        lines = []
+        for field, kind in (("calls", "counter"), ("wall_seconds", "counter"), ("cpu_seconds", "counter"),
+                            ("peak_memory_bytes", "gauge")):
+            samples = [(name, stats[field]) for name, stats in sorted(snapshot["stages"].items()) if field in stats]
+            if samples:
+                metric = f"{prefix}_stage_{field}" + ("_total" if kind == "counter" else "")
+                lines.append(f"# TYPE {metric} {kind}")
+                lines.extend(f"{metric}{labels([('stage', name)])} {value}" for name, value in samples)
+        typed = set()
+        for counter in snapshot["counters"]:
+            metric = f"{prefix}_{counter['name']}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{labels(sorted(counter['labels'].items()))} {counter['value']}")
+        gauges = dict(snapshot["gauges"])
+        if snapshot["cache_hit_ratio"] is not None:
+            gauges["cache_hit_ratio"] = snapshot["cache_hit_ratio"]
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write metrics to ``path``: Prometheus text for ``.prom``/``.txt``, JSON otherwise."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+        return path
+
+    def write_profile(self, path):
+        """Dump the cProfile statistics (readable with ``pstats``); no-op unless profiling."""
+        if self.profiler is not None:
+            self.profiler.dump_stats(path)
+        return path
+
+def instrumented(stage):
+    """Decorator recording every call of a pipeline method as ``stage`` in the shared metrics."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PipelineMetrics.shared().stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Persistent Response Cache
+class ResponseCache:
+    """SQLite-backed cache for provider responses.
+
+    Entries stored without a TTL (confirmed transactions) never expire and are
+    never evicted. Entries with a TTL (address listings) expire after ``ttl``
+    seconds and are evicted least-recently-used once the mutable part of the
+    cache grows beyond ``max_bytes``.
+    """
+    def __init__(self, path="bitEthTool_cache.sqlite", max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " provider TEXT NOT NULL, endpoint TEXT NOT NULL, key TEXT NOT NULL,"
+            " body TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires REAL, accessed REAL NOT NULL,"
+            " PRIMARY KEY (provider, endpoint, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (expires, accessed)")
+        self._conn.commit()
+
+    def get(self, provider, endpoint, key):
+        """Return the cached payload or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, expires FROM responses WHERE provider=? AND endpoint=? AND key=?",
+                (provider, endpoint, key),
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                if row is not None:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE provider=? AND endpoint=? AND key=?",
+                        (provider, endpoint, key),
+                    )
+                    self._conn.commit()
+                self.misses += 1
+                PipelineMetrics.shared().count("cache_lookups", provider=provider, result="miss")
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed=? WHERE provider=? AND endpoint=? AND key=?",
+                (now, provider, endpoint, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+        PipelineMetrics.shared().count("cache_lookups", provider=provider, result="hit")
+        return json.loads(row[0])
+
+    def put(self, provider, endpoint, key, payload, ttl=None):
+        """Store a payload; ``ttl=None`` marks it immutable."""
+        body = json.dumps(payload, separators=(",", ":"))
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (provider, endpoint, key, body, len(body), expires, now),
+            )
+            if expires is not None:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drop expired entries, then least-recently-used mutable ones over the size cap."""
+        self._conn.execute("DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?", (now,))
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires IS NOT NULL"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT rowid, size FROM responses WHERE expires IS NOT NULL ORDER BY accessed"
+        ).fetchall()
+        stale = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((rowid,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE rowid=?", stale)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Shared HTTP Transport with Rate Limiting
+PROVIDER_RATE_LIMITS = {
+    "etherscan": 5.0,  # free-tier ceiling, requests per second
+    "blockchain.info": 3.0,
+    "coingecko": 0.5,
+}
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is available."""
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class HTTPTransport:
+    """Pooled ``requests`` session with per-provider rate limits, retries and counters."""
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rate_limits=None, max_retries=5, backoff_base=0.5, backoff_cap=30.0,
+                 timeout=(5, 30), pool_size=32):
+        self.rate_limits = dict(PROVIDER_RATE_LIMITS if rate_limits is None else rate_limits)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """Process-wide transport used by APIs that are not given one explicitly."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def _bucket(self, provider):
+        with self._lock:
+            if provider not in self._buckets and self.rate_limits.get(provider):
+                self._buckets[provider] = TokenBucket(self.rate_limits[provider])
+            return self._buckets.get(provider)
+
+    def _record(self, provider, **counts):
+        metrics = PipelineMetrics.shared()
+        for name, value in counts.items():
+            metrics.count("http_seconds" if name == "latency" else f"http_{name}", value, provider=provider)
+        with self._lock:
+            stats = self._stats.setdefault(provider, {
+                "requests": 0, "errors": 0, "retries": 0, "throttled": 0,
+                "bytes": 0, "latency_total": 0.0, "latency_max": 0.0,
+            })
+            for name, value in counts.items():
+                if name == "latency":
+                    stats["latency_total"] += value
+                    stats["latency_max"] = max(stats["latency_max"], value)
+                else:
+                    stats[name] += value
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(self.backoff_cap, float(retry_after))
+            except ValueError:
+                pass
+        # Full jitter: uniform over [0, base * 2^attempt], capped.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def get(self, provider, url, params=None, throttled=None):
+        """GET ``url`` for ``provider``, retrying 429/5xx, network errors and ``throttled`` responses.
+
+        Returns the last response, or None when every attempt failed at the network level.
+        """
+        bucket = self._bucket(provider)
+        response = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._record(provider, retries=1)
+            if bucket is not None:
+                bucket.acquire()
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._record(provider, requests=1, errors=1, latency=time.monotonic() - started)
+                logger.warning(f"Request to {provider} failed ({e}); attempt {attempt + 1}/{self.max_retries + 1}.",
+                               extra={"provider": provider, "attempt": attempt + 1})
+                response = None
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self._record(provider, requests=1, bytes=len(response.content),
+                         latency=time.monotonic() - started)
+            is_throttled = response.status_code == 429 or (throttled is not None and throttled(response))
+            if is_throttled:
+                self._record(provider, throttled=1)
+            if not is_throttled and response.status_code not in RETRY_STATUS_CODES:
+                return response
+            self._record(provider, errors=1)
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+        return response
+
+    def stats(self):
+        """Per-provider request, error, byte and latency counters."""
+        with self._lock:
+            report = {}
+            for provider, stats in self._stats.items():
+                report[provider] = dict(stats)
+                report[provider]["latency_avg"] = (
+                    stats["latency_total"] / stats["requests"] if stats["requests"] else 0.0
+                )
+            return report
 
 # Base API Class
 class BlockchainAPI:
     """Base class to handle different blockchain API integrations."""
-    def get_address_info(self, address, limit):
-        """Fetch information about a specific address."""
+    provider = None
+    provider_name = "API"
+    address_ttl = 3600
+
+    def __init__(self, cache=None, transport=None):
+        self.cache = cache
+        self.transport = transport or HTTPTransport.shared()
+
+    def _is_throttled(self, response):
+        """Provider-specific check for rate-limit responses sent with HTTP 200."""
+        return False
+
+    max_page_size = 50
+    supports_start_block = False  # whether get_address_page accepts ``start_block``
+    batch_size = 1  # addresses per get_addresses_info request
+
+    @staticmethod
+    def block_height(tx):
+        """Block a transaction was mined in, or None while it is unconfirmed."""
+        block = _to_int(tx.get("block_height") or tx.get("blockNumber"))
+        return None if block == _MISSING_INT else block
+
+    def get_address_info(self, address, limit, since_block=None):
+        """Fetch up to ``limit`` of an address's most recent transactions.
+
+        Pages are requested only until ``limit`` rows are collected. With
+        ``since_block`` only confirmed transactions mined after that block are
+        returned: providers with a start-block filter apply it server-side,
+        others stop paging at the first page reaching already-seen blocks.
+        Returns None when the first page could not be fetched.
+        """
+        txs = []
+        for page in self.iter_address_pages(address, min(limit, self.max_page_size), since_block):
+            if page is None:
+                return txs or None
+            if since_block is None:
+                txs.extend(page)
+            else:
+                blocks = [self.block_height(tx) for tx in page]
+                txs.extend(tx for tx, block in zip(page, blocks) if block is not None and block > since_block)
+                # Histories are served newest first, so older pages hold nothing new.
+                if any(block is not None and block <= since_block for block in blocks):
+                    break
+            if len(txs) >= limit:
+                break
+        return txs[:limit]
+
+    def get_addresses_info(self, addresses, limit, since_blocks=None):
+        """``get_address_info`` for several addresses; returns results in the order of ``addresses``.
+
+        Providers with a multi-address endpoint override this; by default each
+        address is fetched on its own.
+        """
+        since_blocks = since_blocks or {}
+        return [self.get_address_info(address, limit, since_block=since_blocks.get(address))
+                for address in addresses]
+
+    def extract_edges(self, tx):
+        """``(from, to, value)`` transfers in a provider transaction; account-based chains have one."""
+        from_addr, to_addr = tx.get("from"), tx.get("to")
+        return [(from_addr, to_addr, _to_amount(tx.get("value")))] if from_addr and to_addr else []
+
+    def iter_address_pages(self, address, page_size, since_block=None):
+        """Yield successive pages of transactions; a failed page is yielded as None and ends the stream."""
+        options = {"start_block": since_block + 1} if since_block is not None and self.supports_start_block else {}
+        page_number = 0
+        while True:
+            page = self.get_address_page(address, page_number, page_size, **options)
+            yield page
+            if not page or len(page) < page_size:
+                return
+            page_number += 1
+
+    def get_address_page(self, address, page_number, page_size):
+        """Fetch one page of an address's history using the provider's own paging."""
         raise NotImplementedError
 
     def get_transaction_info(self, txid):
         """Fetch transaction details."""
         raise NotImplementedError
 
+    def _get_json(self, url, endpoint=None, key=None, ttl=None, cacheable=None):
+        """GET ``url`` and decode JSON, going through the response cache when one is set.
+
+        ``cacheable`` decides whether a decoded payload may be stored; ``ttl=None``
+        stores it forever.
+        """
+        use_cache = self.cache is not None and endpoint is not None
+        if use_cache:
+            cached = self.cache.get(self.provider, endpoint, key)
+            if cached is not None:
+                PipelineMetrics.shared().count("api_calls", provider=self.provider, source="cache")
+                return cached
+
+        PipelineMetrics.shared().count("api_calls", provider=self.provider, source="network")
+        response = self.transport.get(self.provider, url, throttled=self._is_throttled)
+        if response is None:
+            logger.error(f"No response from {self.provider_name}.", extra={"provider": self.provider})
+            return None
+        if response.status_code != 200:
+            logger.error(f"Received status code {response.status_code} from {self.provider_name}.",
+                         extra={"provider": self.provider, "status_code": response.status_code})
+            return None
+        data = response.json()
+
+        if use_cache and (cacheable is None or cacheable(data)):
+            self.cache.put(self.provider, endpoint, key, data, ttl)
+        return data
+
     def get_exchange_rates(self):
         """Get current cryptocurrency exchange rates for conversion."""
         try:
-            response = requests.get('https://api.coingecko.com/api/v3/exchange_rates')
-            if response.status_code == 200:
+            response = self.transport.get("coingecko", 'https://api.coingecko.com/api/v3/exchange_rates')
+            if response is not None and response.status_code == 200:
                 return response.json().get('rates')
             else:
-                print(f"Error: Unable to fetch exchange rates. Status code: {response.status_code}")
+                status = response.status_code if response is not None else None
+                logger.error(f"Unable to fetch exchange rates. Status code: {status}")
                 return None
         except Exception as e:
-            print(f"Error fetching exchange rates: {e}")
+            logger.error(f"Error fetching exchange rates: {e}")
             return None
 
 # Bitcoin API Class
 class BitcoinAPI(BlockchainAPI):
-    def get_address_info(self, address, limit):
-        url = f"https://blockchain.info/rawaddr/{address}"
-        response = requests.get(url)
+    provider = "blockchain.info"
+    provider_name = "Bitcoin API"
+
+    max_page_size = 50  # rawaddr caps ``limit`` at 50
+    batch_size = 20  # addresses per multiaddr request
+    multiaddr_page_size = 100  # multiaddr caps ``n`` at 100
+
+    @staticmethod
+    def _sides(tx):
+        """Per-address input and output totals of a UTXO transaction."""
+        inputs, outputs = {}, {}
+        for spent in tx.get("inputs", []):
+            prev_out = spent.get("prev_out") or {}
+            if prev_out.get("addr"):
+                inputs[prev_out["addr"]] = inputs.get(prev_out["addr"], 0.0) + _to_float(prev_out.get("value"))
+        for output in tx.get("out", []):
+            if output.get("addr"):
+                outputs[output["addr"]] = outputs.get(output["addr"], 0.0) + _to_float(output.get("value"))
+        return inputs, outputs
+
+    def extract_edges(self, tx):
+        """Input-to-output edges; each output's value is split across inputs by their share of the input total.
+
+        Change returned to an input address yields no edge, and coinbase
+        transactions (no spent outputs) yield none at all.
+        """
+        inputs, outputs = self._sides(tx)
+        total_in = sum(inputs.values())
+        edges = []
+        for from_addr, spent in inputs.items():
+            share = spent / total_in if total_in else 1.0 / len(inputs)
+            edges.extend((from_addr, to_addr, value * share)
+                         for to_addr, value in outputs.items() if to_addr != from_addr)
+        return edges
+
+    def get_addresses_info(self, addresses, limit, since_blocks=None):
+        """Fetch addresses with multiaddr, ``multiaddr_page_size // limit`` per request.
+
+        multiaddr returns the newest transactions of all addresses merged, so
+        an address is complete when it has ``limit`` rows, all of its
+        ``n_tx``, or (with ``since_blocks``) reaches an already-synced block;
+        the rest, and every address if the request fails, fall back to rawaddr.
+        """
+        # Keep ``limit`` rows per address within one response page.
+        per_request = max(1, self.multiaddr_page_size // max(1, limit))
+        if len(addresses) > per_request:
+            return [result for start in range(0, len(addresses), per_request)
+                    for result in self.get_addresses_info(addresses[start:start + per_request], limit, since_blocks)]
+        if len(addresses) < 2:
+            return super().get_addresses_info(addresses, limit, since_blocks)
+        since_blocks = since_blocks or {}
+        page_size = min(self.multiaddr_page_size, limit * len(addresses))
+        active = "|".join(addresses)
+        url = f"https://blockchain.info/multiaddr?active={active}&n={page_size}"
         try:
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("txs", [])[:limit] if isinstance(data, dict) else None
+            data = self._get_json(url, "multiaddr", f"{active}:{page_size}", ttl=self.address_ttl,
+                                  cacheable=lambda d: isinstance(d, dict))
+        except ValueError:
+            logger.error("Non-JSON response from Bitcoin API.")
+            data = None
+        if not isinstance(data, dict):
+            return super().get_addresses_info(addresses, limit, since_blocks)
+
+        truncated = len(data.get("txs", [])) >= page_size
+        n_tx = {entry.get("address"): entry.get("n_tx", 0) for entry in data.get("addresses", [])}
+        by_address = {address: [] for address in addresses}
+        for tx in data.get("txs", []):
+            inputs, outputs = self._sides(tx)
+            for address in inputs.keys() | outputs.keys():
+                if address in by_address:
+                    by_address[address].append(tx)
+
+        results = []
+        for address in addresses:
+            txs, since_block = by_address[address], since_blocks.get(address)
+            reached_synced = False
+            if since_block is not None:
+                blocks = [self.block_height(tx) for tx in txs]
+                reached_synced = any(block is not None and block <= since_block for block in blocks)
+                txs = [tx for tx, block in zip(txs, blocks) if block is not None and block > since_block]
+            if truncated and not reached_synced and len(txs) < limit and len(by_address[address]) < n_tx.get(address, 0):
+                results.append(self.get_address_info(address, limit, since_block=since_block))
             else:
-                print(f"Error: Received status code {response.status_code} from Bitcoin API.")
-                return None
+                results.append(txs[:limit])
+        return results
+
+    def get_address_page(self, address, page_number, page_size):
+        offset = page_number * page_size
+        url = f"https://blockchain.info/rawaddr/{address}?limit={page_size}&offset={offset}"
+        try:
+            data = self._get_json(url, "rawaddr", f"{address}:{page_size}:{offset}", ttl=self.address_ttl,
+                                  cacheable=lambda d: isinstance(d, dict))
+            return data.get("txs", []) if isinstance(data, dict) else None
         except ValueError:
-            print("Error: Non-JSON response from Bitcoin API.")
+            logger.error("Non-JSON response from Bitcoin API.")
             return None
 
     def get_transaction_info(self, txid):
         url = f"https://blockchain.info/rawtx/{txid}"
-        response = requests.get(url)
         try:
-            if response.status_code == 200:
-                data = response.json()
-                return data if isinstance(data, dict) else None
-            else:
-                print(f"Error: Received status code {response.status_code} from Bitcoin API.")
-                return None
+            # Only confirmed transactions are immutable, so only those are cached.
+            data = self._get_json(url, "rawtx", txid,
+                                  cacheable=lambda d: isinstance(d, dict) and d.get("block_height") is not None)
+            return data if isinstance(data, dict) else None
         except ValueError:
-            print("Error: Non-JSON response from Bitcoin API.")
+            logger.error("Non-JSON response from Bitcoin API.")
             return None
 
 # Ethereum API Class
 class EthereumAPI(BlockchainAPI):
-    def __init__(self, api_key):
+    provider = "etherscan"
+    provider_name = "Etherscan API"
+
+    def __init__(self, api_key, cache=None, transport=None):
+        super().__init__(cache, transport)
         self.api_key = api_key
 
-    def get_address_info(self, address, limit):
-        url = f"https://api.etherscan.io/api?module=account&action=txlist&address={address}&sort=desc&apikey={self.api_key}"
-        response = requests.get(url)
+    def _is_throttled(self, response):
+        # Etherscan reports rate limiting as HTTP 200 with status "0".
+        return response.status_code == 200 and b"rate limit" in response.content[:256].lower()
+
+    max_page_size = 1000  # txlist serves at most 10,000 rows across page * offset
+    supports_start_block = True
+
+    def get_address_page(self, address, page_number, page_size, start_block=0):
+        url = (f"https://api.etherscan.io/api?module=account&action=txlist&address={address}"
+               f"&startblock={start_block}&endblock=99999999&page={page_number + 1}&offset={page_size}"
+               f"&sort=desc&apikey={self.api_key}")
         try:
-            if response.status_code == 200:
-                data = response.json().get('result', [])
-                return data[:limit] if isinstance(data, list) else None
-            else:
-                print(f"Error: Received status code {response.status_code} from Etherscan API.")
-                return None
+            payload = self._get_json(url, "txlist", f"{address.lower()}:{start_block}:{page_size}:{page_number}",
+                                     ttl=self.address_ttl,
+                                     cacheable=lambda d: isinstance(d, dict) and isinstance(d.get("result"), list))
+            data = payload.get('result', []) if payload is not None else None
+            return data if isinstance(data, list) else None
         except ValueError:
-            print("Error: Non-JSON response from Etherscan API.")
+            logger.error("Non-JSON response from Etherscan API.")
             return None
 
     def get_transaction_info(self, txid):
         url = f"https://api.etherscan.io/api?module=proxy&action=eth_getTransactionByHash&txhash={txid}&apikey={self.api_key}"
-        response = requests.get(url)
         try:
-            if response.status_code == 200:
-                data = response.json().get('result')
-                return data if isinstance(data, dict) else None
-            else:
-                print(f"Error: Received status code {response.status_code} from Etherscan API.")
-                return None
+            # Pending transactions have no blockNumber yet and must not be cached forever.
+            payload = self._get_json(url, "eth_getTransactionByHash", txid.lower(),
+                                     cacheable=lambda d: isinstance(d, dict) and isinstance(d.get("result"), dict)
+                                     and d["result"].get("blockNumber") is not None)
+            data = payload.get('result') if payload is not None else None
+            return data if isinstance(data, dict) else None
         except ValueError:
-            print("Error: Non-JSON response from Etherscan API.")
+            logger.error("Non-JSON response from Etherscan API.")
             return None
 
 # Utility Function for Address Detection
@@ -110,10 +762,109 @@ def identify_blockchain(address):
     else:
         return None
 
+# Watchlist Index for High-Volume Screening
+def _address_hash(address):
+    """Two 64-bit hashes of a normalised address: the index key and the Bloom filter stride."""
+    normalised = address.lower() if address.startswith("0x") else address
+    digest = hashlib.blake2b(normalised.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+class WatchlistIndex:
+    """Memory-mapped attribution index: sorted 64-bit address hashes plus a Bloom prefilter.
+
+    ``build`` streams CSV files (an ``address`` column plus optional ``owner``,
+    ``risk_level``, ``entity_type`` and ``source``) into a directory of ``.npy``
+    arrays; opening the index maps them without parsing anything.
+    """
+    LABEL_FIELDS = ("owner", "risk_level", "entity_type", "source")
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "labels.json"), encoding="utf-8") as f:
+            self.labels = json.load(f)
+        self.bloom_bits = meta["bloom_bits"]
+        self.bloom_hashes = meta["bloom_hashes"]
+        self.keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        self.label_ids = np.load(os.path.join(path, "label_ids.npy"), mmap_mode="r")
+        self.bloom = np.load(os.path.join(path, "bloom.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, csv_paths, path, false_positive_rate=0.01):
+        """Build an index directory from attribution CSVs and return the opened index."""
+        keys, strides, label_ids = array("Q"), array("Q"), array("I")
+        labels, label_index = [], {}
+        for csv_path in csv_paths:
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    address = (row.get("address") or "").strip()
+                    if not address:
+                        continue
+                    label = tuple((row.get(field) or "Unknown").strip() for field in cls.LABEL_FIELDS)
+                    if label not in label_index:
+                        label_index[label] = len(labels)
+                        labels.append(dict(zip(cls.LABEL_FIELDS, label)))
+                    key, stride = _address_hash(address)
+                    keys.append(key)
+                    strides.append(stride)
+                    label_ids.append(label_index[label])
+
+        keys = np.frombuffer(keys, dtype=np.uint64) if len(keys) else np.zeros(0, np.uint64)
+        strides = np.frombuffer(strides, dtype=np.uint64) if len(strides) else np.zeros(0, np.uint64)
+        label_ids = np.frombuffer(label_ids, dtype=np.uint32) if len(label_ids) else np.zeros(0, np.uint32)
+        # Later files win for duplicate addresses.
+        keys, first = np.unique(keys[::-1], return_index=True)
+        strides = strides[::-1][first]
+        label_ids = label_ids[::-1][first]
+
+        n = max(1, len(keys))
+        bloom_bits = max(64, int(-n * math.log(false_positive_rate) / math.log(2) ** 2))
+        bloom_hashes = max(1, round(bloom_bits / n * math.log(2)))
+        bloom = np.zeros((bloom_bits + 7) // 8, dtype=np.uint8)
+        for i in range(bloom_hashes):
+            bits = (keys + np.uint64(i) * strides) % np.uint64(bloom_bits)
+            np.bitwise_or.at(bloom, bits // 8, (1 << (bits % 8)).astype(np.uint8))
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "keys.npy"), keys)
+        np.save(os.path.join(path, "label_ids.npy"), label_ids)
+        np.save(os.path.join(path, "bloom.npy"), bloom)
+        with open(os.path.join(path, "labels.json"), "w", encoding="utf-8") as f:
+            json.dump(labels, f)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"entries": int(len(keys)), "bloom_bits": bloom_bits, "bloom_hashes": bloom_hashes}, f)
+        return cls(path)
+
+    def screen(self, addresses):
+        """Return ``{address: label}`` for every listed address among ``addresses``."""
+        addresses = list(addresses)
+        if not addresses or not len(self.keys):
+            return {}
+        hashes = np.array([_address_hash(address) for address in addresses], dtype=np.uint64).reshape(-1, 2)
+        keys, strides = hashes[:, 0], hashes[:, 1]
+
+        candidate = np.ones(len(addresses), dtype=bool)
+        for i in range(self.bloom_hashes):
+            bits = (keys + np.uint64(i) * strides) % np.uint64(self.bloom_bits)
+            candidate &= ((self.bloom[bits // 8] >> (bits % 8)) & 1).astype(bool)
+        rows = np.nonzero(candidate)[0]
+        if not len(rows):
+            return {}
+
+        positions = np.searchsorted(self.keys, keys[rows])
+        positions = np.minimum(positions, len(self.keys) - 1)
+        found = self.keys[positions] == keys[rows]
+        return {addresses[row]: self.labels[int(self.label_ids[position])]
+                for row, position in zip(rows[found], positions[found])}
+
 # KYC/AML Information Extraction
 class KYCAMLData:
-    """Simulated KYC/AML data integration."""
-    def __init__(self):
+    """Simulated KYC/AML data integration, optionally backed by a ``WatchlistIndex``."""
+    def __init__(self, watchlist_path=None):
         self.known_wallets = {
             "0x4838b106fce9647bdf1e7877bf73ce8b0bad5f97": {
                 "owner": "John Doe",
@@ -126,89 +877,473 @@ class KYCAMLData:
                 "entity_type": "Unknown"
             }
         }
+        self.watchlist = WatchlistIndex(watchlist_path) if watchlist_path else None
 
     def get_kyc_info(self, address):
         """Retrieve KYC information for a given address."""
-        return self.known_wallets.get(address, {
+        if address in self.known_wallets:
+            return self.known_wallets[address]
+        if self.watchlist is not None:
+            hit = self.watchlist.screen([address])
+            if hit:
+                return hit[address]
+        return {
             "owner": "Unknown",
             "risk_level": "Unknown",
             "entity_type": "Unknown"
-        })
+        }
+
+    def screen_addresses(self, addresses):
+        """Bulk-screen addresses; returns ``{address: label}`` for hits only."""
+        addresses = list(addresses)
+        hits = self.watchlist.screen(addresses) if self.watchlist is not None else {}
+        for address in addresses:
+            if address in self.known_wallets:
+                hits[address] = self.known_wallets[address]
+        return hits
+
+# Historical Price Table
+CRYPTO_UNITS = {"Bitcoin": 1e8, "Ethereum": 1e18}  # satoshis per BTC, wei per ETH
+FIAT_CURRENCIES = ("usd", "inr")
+
+class PriceTable:
+    """Local SQLite table of historical CoinGecko prices per asset and fiat currency.
+
+    ``fill`` downloads only the part of a time range not already stored;
+    ``lookup`` maps an array of Unix timestamps to the most recent stored
+    price at or before each one and works offline once the table is filled.
+    Prices more than ``max_age`` seconds older than the timestamp (CoinGecko's
+    coarsest, daily, sample interval by default) are not used.
+    """
+    COINGECKO_IDS = {"Bitcoin": "bitcoin", "Ethereum": "ethereum"}
+
+    def __init__(self, path="bitEthTool_prices.sqlite", transport=None, offline=False, max_age=86400):
+        self.path = path
+        self.offline = offline
+        self.max_age = max_age
+        self.transport = transport
+        self._series = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prices (asset TEXT NOT NULL, currency TEXT NOT NULL,"
+            " ts INTEGER NOT NULL, price REAL NOT NULL, PRIMARY KEY (asset, currency, ts))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS coverage (asset TEXT NOT NULL, currency TEXT NOT NULL,"
+            " start INTEGER NOT NULL, end INTEGER NOT NULL, PRIMARY KEY (asset, currency))"
+        )
+        self._conn.commit()
+
+    def __getstate__(self):
+        # Checkpoints pickle the case; reopen the database instead of pickling the connection.
+        return {"path": self.path, "offline": self.offline, "max_age": self.max_age}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], offline=state["offline"], max_age=state.get("max_age", 86400))
+
+    def fill(self, asset, currency, start, end):
+        """Make sure prices for ``[start, end]`` (Unix seconds) are stored locally.
+
+        The range is widened by ``max_age`` so the earliest timestamps also
+        have a sample at or before them.
+        """
+        if self.offline:
+            return
+        if self.max_age is not None:
+            start -= self.max_age
+        with self._lock:
+            row = self._conn.execute("SELECT start, end FROM coverage WHERE asset=? AND currency=?",
+                                     (asset, currency)).fetchone()
+        if row is None:
+            missing = [(start, end)]
+        else:
+            missing = [(a, b) for a, b in ((start, row[0] - 1), (row[1] + 1, end)) if a <= b]
+        for a, b in missing:
+            self._download(asset, currency, a, b)
+
+    def _download(self, asset, currency, start, end):
+        url = (f"https://api.coingecko.com/api/v3/coins/{self.COINGECKO_IDS[asset]}/market_chart/range"
+               f"?vs_currency={currency}&from={int(start)}&to={int(end)}")
+        transport = self.transport or HTTPTransport.shared()
+        response = transport.get("coingecko", url)
+        if response is None or response.status_code != 200:
+            status = response.status_code if response is not None else None
+            logger.error(f"Unable to fetch {asset} price history. Status code: {status}")
+            return
+        try:
+            points = response.json().get("prices", [])
+        except ValueError:
+            logger.error("Non-JSON response from CoinGecko API.")
+            return
+        if not points:
+            return
+        # Only the span the samples actually cover counts as filled, give or take one sample interval
+        # at the edges; anything further out is requested again later.
+        times = [int(ms // 1000) for ms, _ in points]
+        slack = self.max_age or 0
+        covered = (int(start) if min(times) - start <= slack else min(times),
+                   int(end) if end - max(times) <= slack else max(times))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?)",
+                                   ((asset, currency, ts, price) for ts, (_, price) in zip(times, points)))
+            self._conn.execute(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?) ON CONFLICT(asset, currency) DO UPDATE SET"
+                " start=MIN(start, excluded.start), end=MAX(end, excluded.end)",
+                (asset, currency, *covered),
+            )
+            self._conn.commit()
+            self._series.pop((asset, currency), None)
+
+    def series(self, asset, currency):
+        """Sorted ``(timestamps, prices)`` arrays for an asset, loaded once per process."""
+        key = (asset, currency)
+        with self._lock:
+            if key not in self._series:
+                rows = self._conn.execute(
+                    "SELECT ts, price FROM prices WHERE asset=? AND currency=? ORDER BY ts", key
+                ).fetchall()
+                data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+                self._series[key] = (data[:, 0], data[:, 1])
+            return self._series[key]
+
+    def lookup(self, asset, currency, timestamps):
+        """Price at or before each timestamp (NaN when no stored price is recent enough or the timestamp is NaN)."""
+        ts, prices = self.series(asset, currency)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if not len(ts):
+            return np.full(len(timestamps), np.nan)
+        positions = np.searchsorted(ts, timestamps, side="right") - 1
+        result = prices[np.maximum(positions, 0)]
+        stale = (positions < 0) | np.isnan(timestamps)
+        if self.max_age is not None:
+            stale |= timestamps - ts[np.maximum(positions, 0)] > self.max_age
+        result[stale] = np.nan
+        return result
+
+# Compact Transaction Store
+CRYPTO_TYPES = ("Bitcoin", "Ethereum")
+_MISSING_INT = -1
+
+def _to_float(value, default=0.0):
+    """Best-effort numeric conversion for provider fields that may be missing or strings."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _to_amount(value):
+    """Exact ``int`` for integral amounts (wei and satoshi strings), otherwise a float."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    return _to_float(value)
+
+def _to_int(value, default=_MISSING_INT):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+class TransactionStore:
+    """Columnar transaction records with addresses interned to integer IDs.
+
+    Numeric fields live in typed arrays (NaN / -1 mark missing values) and each
+    address keeps an array of record indices instead of a list of dicts.
+    ``values`` is float64 for the vectorised analytics; integer amounts that
+    float64 cannot represent (most wei values) are also kept exactly in
+    ``exact_values`` (None elsewhere) and returned by ``record``. Raw
+    provider payloads are dropped by default; ``keep_payloads`` keeps them in
+    memory and ``payload_path`` appends them to a JSON-lines file read back on
+    demand. Iterating or indexing the store yields the classic record dicts.
+    """
+    def __init__(self, keep_payloads=False, payload_path=None):
+        self.keep_payloads = keep_payloads
+        self.payload_path = payload_path
+        self.addresses = []  # address ID -> address
+        self.address_ids = {}  # address -> address ID
+        self.symbols = []  # token symbol ID -> symbol
+        self.symbol_ids = {}
+
+        self.from_ids = array("i")
+        self.to_ids = array("i")
+        self.txids = []
+        self.timestamps = array("d")
+        self.values = array("d")
+        self.exact_values = []
+        self.values_usd = array("d")
+        self.values_inr = array("d")
+        self.fees = array("d")
+        self.blocks = array("q")
+        self.confirmations = array("q")
+        self.nonces = array("q")
+        self.crypto_types = array("b")
+        self.tokens = array("i")
+        self.by_address = {}  # address ID -> array of record indices
+
+        self._payloads = [] if keep_payloads else None
+        self._payload_offsets = array("q") if payload_path else None
+        self._payload_file = None
+
+    def __getstate__(self):
+        if self._payload_file is not None:
+            self._payload_file.flush()
+        state = self.__dict__.copy()
+        state["_payload_file"] = None
+        return state
+
+    def intern(self, address):
+        """Return the integer ID for ``address``, assigning one if needed."""
+        address_id = self.address_ids.get(address)
+        if address_id is None:
+            address_id = len(self.addresses)
+            self.address_ids[address] = address_id
+            self.addresses.append(address)
+        return address_id
+
+    def _intern_symbol(self, symbol):
+        if symbol is None:
+            return _MISSING_INT
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbol_ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def append(self, from_addr, to_addr, txid, timestamp, value, value_usd, value_inr, fee,
+               block, confirmations, token, crypto_type, nonce, details=None):
+        """Append one record and return its index."""
+        index = len(self.txids)
+        from_id = self.intern(from_addr)
+        to_id = self.intern(to_addr)
+        self.from_ids.append(from_id)
+        self.to_ids.append(to_id)
+        self.txids.append(txid)
+        self.timestamps.append(_to_float(timestamp, math.nan))
+        amount = _to_amount(value)
+        self.values.append(float(amount))
+        self.exact_values.append(amount if isinstance(amount, int) and float(amount) != amount else None)
+        self.values_usd.append(math.nan if value_usd is None else value_usd)
+        self.values_inr.append(math.nan if value_inr is None else value_inr)
+        self.fees.append(_to_float(fee, math.nan))
+        self.blocks.append(_to_int(block))
+        self.confirmations.append(_to_int(confirmations))
+        self.nonces.append(_to_int(nonce))
+        self.crypto_types.append(CRYPTO_TYPES.index(crypto_type))
+        self.tokens.append(self._intern_symbol(token))
+        self.by_address.setdefault(from_id, array("i")).append(index)
+        self.by_address.setdefault(to_id, array("i")).append(index)
+
+        if self._payloads is not None:
+            self._payloads.append(details)
+        if self._payload_offsets is not None:
+            if self._payload_file is None:
+                self._payload_file = open(self.payload_path, "ab")
+            self._payload_offsets.append(self._payload_file.tell())
+            self._payload_file.write(json.dumps(details, separators=(",", ":")).encode() + b"\n")
+        return index
+
+    def payload(self, index):
+        """Return the raw provider payload for a record, or None if payloads are not kept."""
+        if self._payloads is not None:
+            return self._payloads[index]
+        if self._payload_offsets is not None:
+            if self._payload_file is not None:
+                self._payload_file.flush()
+            with open(self.payload_path, "rb") as f:
+                f.seek(self._payload_offsets[index])
+                return json.loads(f.readline())
+        return None
+
+    def record(self, index, include_details=True):
+        """Materialise record ``index`` as a transaction dict."""
+        def optional(value):
+            return None if math.isnan(value) else value
+
+        def optional_int(value):
+            return None if value == _MISSING_INT else value
+
+        value = self.values[index]
+        exact = self.exact_values[index]
+        token = self.tokens[index]
+        timestamp = self.timestamps[index]
+        return {
+            "from": self.addresses[self.from_ids[index]],
+            "to": self.addresses[self.to_ids[index]],
+            "txid": self.txids[index],
+            "timestamp": None if math.isnan(timestamp) else int(timestamp),
+            "value": exact if exact is not None else int(value) if value.is_integer() else value,
+            "value_usd": optional(self.values_usd[index]),
+            "value_inr": optional(self.values_inr[index]),
+            "fee": optional(self.fees[index]),
+            "block": optional_int(self.blocks[index]),
+            "confirmations": optional_int(self.confirmations[index]),
+            "token_transfer": self.symbols[token] if token != _MISSING_INT else None,
+            "crypto_type": CRYPTO_TYPES[self.crypto_types[index]],
+            "nonce": optional_int(self.nonces[index]),
+            "details": self.payload(index) if include_details else None,
+        }
+
+    def indices_for(self, address):
+        """Record indices touching ``address`` (an empty array if it is unknown)."""
+        address_id = self.address_ids.get(address)
+        return self.by_address.get(address_id, array("i"))
+
+    def __len__(self):
+        return len(self.txids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("transaction index out of range")
+        return self.record(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def iter_records(self, include_details=False):
+        """Stream record dicts, skipping the payload lookup unless asked for."""
+        for index in range(len(self)):
+            yield self.record(index, include_details)
+
+class AddressHistoryView(Mapping):
+    """Read-only ``address -> [record dict, ...]`` view over a ``TransactionStore``."""
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, address):
+        address_id = self.store.address_ids.get(address)
+        if address_id is None or address_id not in self.store.by_address:
+            raise KeyError(address)
+        return [self.store.record(i) for i in self.store.by_address[address_id]]
+
+    def __iter__(self):
+        for address_id in self.store.by_address:
+            yield self.store.addresses[address_id]
+
+    def __len__(self):
+        return len(self.store.by_address)
+
+    def count(self, address):
+        """Number of records touching ``address`` without materialising them."""
+        return len(self.store.indices_for(address))
 
 # Investigation Case Class with Enhanced Tracking
 class InvestigationCase:
-    def __init__(self, case_id, suspected_addresses, exchange_rates):
+    def __init__(self, case_id, suspected_addresses, exchange_rates, keep_payloads=False, payload_path=None,
+                 price_table=None):
         self.case_id = case_id
         self.suspected_addresses = suspected_addresses
-        self.transaction_data = []  
-        self.history = {}  
+        self.store = TransactionStore(keep_payloads=keep_payloads, payload_path=payload_path)
         self.bounce_count = 0  
         self.exchange_rates = exchange_rates
+        self.price_table = price_table
+        self._fiat_converted = 0  # records before this index have fiat values
 
-    def convert_value_to_fiat(self, crypto_value, crypto_type):
-        """Convert cryptocurrency value to USD and INR."""
-        if not self.exchange_rates:
-            return None, None
+    @property
+    def transaction_data(self):
+        """All transaction records, as a read-only sequence of dicts."""
+        return self.store
 
-        try:
-            crypto_value = float(crypto_value)
-            if crypto_type.lower() == "bitcoin":
-                btc_to_usd = self.exchange_rates.get("usd", {}).get("value")
-                btc_to_inr = self.exchange_rates.get("inr", {}).get("value")
-                if btc_to_usd and btc_to_inr:
-                    value_in_btc = crypto_value / 1e8  # Convert Satoshis to BTC
-                    return value_in_btc * btc_to_usd, value_in_btc * btc_to_inr
-            elif crypto_type.lower() == "ethereum":
-                eth_to_usd = self.exchange_rates.get("usd", {}).get("value")
-                eth_to_inr = self.exchange_rates.get("inr", {}).get("value")
-                if eth_to_usd and eth_to_inr:
-                    value_in_eth = crypto_value / 1e18  # Convert Wei to ETH
-                    return value_in_eth * eth_to_usd, value_in_eth * eth_to_inr
-        except ValueError:
-            print(f"Error: Unable to convert crypto value {crypto_value} to a number.")
-        
-        return None, None
+    @property
+    def history(self):
+        """Records per address, as a read-only mapping of lists of dicts."""
+        return AddressHistoryView(self.store)
 
-    def add_transaction(self, from_addr, to_addr, txid, tx_details):
-        """Add transaction details for tracking."""
+    def _snapshot_rates(self, crypto_type):
+        """Current (USD, INR) price of one coin from CoinGecko's BTC-denominated exchange rates."""
+        if not self.exchange_rates:
+            return None, None
+        usd = self.exchange_rates.get("usd", {}).get("value")
+        inr = self.exchange_rates.get("inr", {}).get("value")
+        if crypto_type == "Ethereum":
+            eth_per_btc = self.exchange_rates.get("eth", {}).get("value")
+            if not eth_per_btc:
+                return None, None
+            usd = usd / eth_per_btc if usd else None
+            inr = inr / eth_per_btc if inr else None
+        return usd, inr
+
+    @instrumented("pricing")
+    def convert_values_to_fiat(self):
+        """Fill USD/INR values for every record added since the last call, in one vectorised pass.
+
+        Each record is priced at its own timestamp from ``price_table`` when one is
+        set; records without a historical price fall back to the current
+        ``exchange_rates`` snapshot.
+        """
+        store = self.store
+        start, end = self._fiat_converted, len(store)
+        if start >= end:
+            return
+        crypto_types = np.frombuffer(store.crypto_types, dtype=np.int8)[start:end]
+        timestamps = np.frombuffer(store.timestamps, dtype=np.float64)[start:end]
+        values = np.frombuffer(store.values, dtype=np.float64)[start:end]
+        targets = {"usd": np.frombuffer(store.values_usd, dtype=np.float64)[start:end],
+                   "inr": np.frombuffer(store.values_inr, dtype=np.float64)[start:end]}
+
+        for code, crypto_type in enumerate(CRYPTO_TYPES):
+            mask = crypto_types == code
+            if not mask.any():
+                continue
+            coins = values[mask] / CRYPTO_UNITS[crypto_type]
+            snapshot = dict(zip(FIAT_CURRENCIES, self._snapshot_rates(crypto_type)))
+            if self.price_table is not None:
+                timed = timestamps[mask][~np.isnan(timestamps[mask])]
+                for currency in FIAT_CURRENCIES:
+                    if len(timed):
+                        self.price_table.fill(crypto_type, currency, timed.min(), timed.max())
+            for currency in FIAT_CURRENCIES:
+                prices = np.full(len(coins), np.nan)
+                if self.price_table is not None:
+                    prices = self.price_table.lookup(crypto_type, currency, timestamps[mask])
+                if snapshot.get(currency):
+                    prices = np.where(np.isnan(prices), snapshot[currency], prices)
+                targets[currency][mask] = coins * prices
+        self._fiat_converted = end
+
+    def add_transaction(self, from_addr, to_addr, txid, tx_details, value=None):
+        """Add transaction details for tracking; ``value`` overrides the payload's (one edge of a UTXO transaction)."""
         crypto_type = "Bitcoin" if "fee" in tx_details else "Ethereum"
-        value = tx_details.get("value", 0)
-
-        value_usd, value_inr = self.convert_value_to_fiat(value, crypto_type)
-
-        transaction_record = {
-            "from": from_addr,
-            "to": to_addr,
-            "txid": txid,
-            "timestamp": tx_details.get("time") or tx_details.get("timeStamp"),
-            "value": value,
-            "value_usd": value_usd,
-            "value_inr": value_inr,
-            "fee": tx_details.get("fee") if "fee" in tx_details else None,
-            "block": tx_details.get("block_height") or tx_details.get("blockNumber"),
-            "confirmations": tx_details.get("confirmations"),
-            "token_transfer": tx_details.get("tokenSymbol") if "tokenSymbol" in tx_details else None,
-            "crypto_type": crypto_type,
-            "nonce": tx_details.get("nonce"),
-            "details": tx_details
-        }
-
-        self.transaction_data.append(transaction_record)
-        self.history.setdefault(from_addr, []).append(transaction_record)
-        self.history.setdefault(to_addr, []).append(transaction_record)
+        value = tx_details.get("value", 0) if value is None else value
+
+        # Fiat values are filled in bulk by convert_values_to_fiat().
+        self.store.append(
+            from_addr, to_addr, txid,
+            timestamp=tx_details.get("time") or tx_details.get("timeStamp"),
+            value=value,
+            value_usd=None,
+            value_inr=None,
+            fee=tx_details.get("fee") if "fee" in tx_details else None,
+            block=tx_details.get("block_height") or tx_details.get("blockNumber"),
+            confirmations=tx_details.get("confirmations"),
+            token=tx_details.get("tokenSymbol") if "tokenSymbol" in tx_details else None,
+            crypto_type=crypto_type,
+            nonce=tx_details.get("nonce"),
+            details=tx_details,
+        )
 
     def calculate_bounce_count(self):
         """Calculate bounce count based on repeated address interactions."""
         self.bounce_count = sum(
-            1 for addr in self.history if len(self.history[addr]) > 1
+            1 for indices in self.store.by_address.values() if len(indices) > 1
         )
-        print(f"Total Bounce Count: {self.bounce_count}")
+        logger.info(f"Total Bounce Count: {self.bounce_count}")
 
     def calculate_risk_factor(self):
         """Calculate a simple risk factor based on bounce count and transaction history."""
         risk_score = 0
-        print(f"Bounce Count: {self.bounce_count}")
-        print(f"Number of Transactions: {len(self.transaction_data)}")
+        logger.info(f"Bounce Count: {self.bounce_count}")
+        logger.info(f"Number of Transactions: {len(self.transaction_data)}")
 
         if self.bounce_count > 5:
             risk_score += 20
@@ -217,114 +1352,1433 @@ class InvestigationCase:
             risk_score += 30
 
         risk_score = min(risk_score, 100)
-        print(f"Calculated Risk Score: {risk_score}")
+        logger.info(f"Calculated Risk Score: {risk_score}")
 
         return risk_score
 
-# Crypto Investigator Class with Transaction Tracking and Pattern Analysis
-class CryptoInvestigator:
-    def __init__(self, api, kyc_aml_data):
-        self.api = api
-        self.kyc_aml_data = kyc_aml_data
-        self.graph = nx.DiGraph()  
+# Resumable Tracing Scheduler
+class TraceScheduler:
+    """Frontier, budgets and checkpoints for ``CryptoInvestigator.trace_transactions``.
+
+    ``priority`` orders the frontier: "fifo" keeps breadth-first order, "value"
+    expands the largest transfers first and "recency" the newest ones. Budgets
+    left as None are unlimited; ``max_api_calls`` counts address lookups.
+    While tracing, the checkpoint is rewritten at most every
+    ``checkpoint_interval`` seconds, since each save pickles the whole case.
+    A checkpoint only resumes a trace started with the same ``params`` and is
+    removed once the frontier has drained. ``visited`` maps each expanded
+    address to the shallowest level it was expanded at; under the "value" and
+    "recency" orders an address may pop deep first and is expanded again if it
+    is later reached at a shallower level.
+    """
+    PRIORITIES = ("fifo", "value", "recency")
+
+    def __init__(self, priority="fifo", max_api_calls=None, max_nodes=None, max_seconds=None,
+                 checkpoint_path=None, checkpoint_interval=30.0):
+        if priority not in self.PRIORITIES:
+            raise ValueError(f"Unknown frontier priority: {priority}")
+        self.priority = priority
+        self.max_api_calls = max_api_calls
+        self.max_nodes = max_nodes
+        self.max_seconds = max_seconds
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+
+        self.params = {}  # address, depth, limit and mode of the trace being checkpointed
+        self.frontier = []  # heap of (priority key, sequence, address, level)
+        self.visited = {}  # address -> shallowest level expanded
+        self.total_transactions = 0
+        self.api_calls = 0
+        self.elapsed = 0.0
+        self._seq = 0
+        self._started = None
+        self._saved = None
+
+    def push(self, addr, level, value=0.0, timestamp=0.0):
+        if self.priority == "value":
+            key = -value
+        elif self.priority == "recency":
+            key = -timestamp
+        else:
+            # Shallower levels first: addresses re-queued from ``sync_state`` may be reached again at a lower level.
+            key = level
+        heapq.heappush(self.frontier, (key, self._seq, addr, level))
+        self._seq += 1
+
+    def pop_batch(self, size):
+        """Pop up to ``size`` entries not yet expanded at their level or shallower, marking them visited."""
+        batch = []
+        while self.frontier and len(batch) < size:
+            entry = heapq.heappop(self.frontier)
+            _, _, addr, level = entry
+            if self.visited.get(addr, level + 1) <= level:
+                continue
+            self.visited[addr] = level
+            batch.append(entry)
+        return batch
+
+    def requeue(self, batch):
+        """Return popped but unprocessed entries to the frontier."""
+        for entry in batch:
+            self.visited.pop(entry[2], None)
+            heapq.heappush(self.frontier, entry)
+
+    def clip_batch(self, size):
+        if self.max_api_calls is None:
+            return size
+        return max(0, min(size, self.max_api_calls - self.api_calls))
+
+    def start_clock(self):
+        self._started = self._saved = time.monotonic()
+
+    def checkpoint_due(self):
+        return bool(self.checkpoint_path) and time.monotonic() - self._saved >= self.checkpoint_interval
+
+    def elapsed_seconds(self):
+        running = time.monotonic() - self._started if self._started is not None else 0.0
+        return self.elapsed + running
+
+    def budget_exhausted(self, graph):
+        """Return the name of the first exhausted budget, or None."""
+        if self.max_api_calls is not None and self.api_calls >= self.max_api_calls:
+            return "API call budget"
+        if self.max_nodes is not None and graph.number_of_nodes() >= self.max_nodes:
+            return "node budget"
+        if self.max_seconds is not None and self.elapsed_seconds() >= self.max_seconds:
+            return "time budget"
+        return None
 
-    def trace_transactions(self, address, case, depth=2, limit=20):
-        """Trace transactions to a specified depth with additional pattern analysis."""
-        queue = [(address, 0)]
-        visited = set()
-        total_transactions = 0
-        transaction_history = {}
-
-        with tqdm(total=depth * limit, desc="Tracing Transactions", unit="tx") as pbar:
-            while queue:
-                addr, level = queue.pop(0)
-                if addr in visited or level > depth:
+    def save(self, investigator, case):
+        """Atomically write the frontier, visited set, graph and case to the checkpoint."""
+        if not self.checkpoint_path:
+            return
+        state = {
+            "priority": self.priority,
+            "params": self.params,
+            "frontier": self.frontier,
+            "visited": self.visited,
+            "total_transactions": self.total_transactions,
+            "api_calls": self.api_calls,
+            "elapsed": self.elapsed_seconds(),
+            "seq": self._seq,
+            "graph": investigator.graph,
+            "sync_state": investigator.sync_state,
+            "case": case.__dict__,
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.checkpoint_path)
+        self._saved = time.monotonic()
+
+    def load(self, investigator, case):
+        """Restore a checkpoint into ``investigator`` and ``case``; False if there is none."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, "rb") as f:
+            state = pickle.load(f)
+        if state["priority"] != self.priority:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} was written with priority "
+                             f"{state['priority']!r}, not {self.priority!r}.")
+        if state.get("params") != self.params:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to a different trace "
+                             f"({state.get('params')}); remove it to start over.")
+        self.frontier = state["frontier"]
+        self._seq = state["seq"]
+        self.visited = state["visited"]
+        if isinstance(self.visited, set):  # checkpoints written before levels were tracked
+            self.visited = dict.fromkeys(self.visited, 0)
+        self.total_transactions = state["total_transactions"]
+        self.api_calls = state["api_calls"]
+        self.elapsed = state["elapsed"]
+        investigator.graph = state["graph"]
+        investigator.sync_state = state.get("sync_state", {})
+        case.__dict__.update(state["case"])
+        return True
+
+    def pending(self):
+        """Whether a checkpoint of an unfinished trace is waiting to be resumed."""
+        return bool(self.checkpoint_path) and os.path.exists(self.checkpoint_path)
+
+    def discard(self):
+        """Remove the checkpoint of a finished trace so it is never resumed."""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+# Case Snapshots with Delta Re-Sync
+class CaseSnapshot:
+    """Append-only, memory-mappable on-disk copy of a traced case.
+
+    A snapshot directory holds one raw little-endian file per
+    ``TransactionStore`` column (the interned edge list is ``from_ids`` /
+    ``to_ids``), newline-separated address, txid and exact-value tables and ``meta.json``,
+    which also carries the investigator's per-address ``sync_state``. Saving a
+    case restored from the snapshot only appends the new rows; any other save
+    writes a new generation of data files and deletes the old one afterwards.
+    ``meta.json`` is replaced last, so an interrupted save leaves the previous
+    snapshot intact. Raw provider payloads are not stored.
+    """
+    VERSION = 1
+    COLUMNS = {
+        "from_ids": "i", "to_ids": "i", "timestamps": "d", "values": "d", "values_usd": "d",
+        "values_inr": "d", "fees": "d", "blocks": "q", "confirmations": "q", "nonces": "q",
+        "crypto_types": "b", "tokens": "i",
+    }
+    TABLES = ("addresses", "txids", "exact_values")
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = None
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if self.meta.get("version") != self.VERSION:
+                raise ValueError(f"Unsupported snapshot version in {path}: {self.meta.get('version')}")
+
+    def exists(self):
+        return self.meta is not None
+
+    def __len__(self):
+        return self.meta["transactions"] if self.meta else 0
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _data_file(self, name, extension, generation=None):
+        """Path of a column or table file; generation 0 keeps the original unsuffixed names."""
+        if generation is None:
+            generation = (self.meta or {}).get("generation", 0)
+        return self._file(f"{name}.{generation}.{extension}" if generation else f"{name}.{extension}")
+
+    def column(self, name):
+        """Read-only memory map of one column (an empty array for an empty snapshot)."""
+        if not len(self):
+            return np.empty(0, dtype=self.COLUMNS[name])
+        return np.memmap(self._data_file(name, "bin"), dtype=self.COLUMNS[name], mode="r", shape=(len(self),))
+
+    def table(self, name):
+        """One of ``TABLES`` as a list of strings."""
+        size = self.meta.get(f"{name}_bytes", 0) if self.meta else 0
+        if not size:
+            return []
+        with open(self._data_file(name, "txt"), "rb") as f:
+            return f.read(size).decode("utf-8").split("\n")[:-1]
+
+    def save(self, case, investigator=None):
+        """Write ``case`` (and ``investigator.sync_state``), appending to a snapshot of the same case."""
+        os.makedirs(self.path, exist_ok=True)
+        store = case.store
+        meta = self.meta
+        append = (meta is not None and meta["case_id"] == case.case_id
+                  and meta["transactions"] <= len(store) and meta["address_count"] <= len(store.addresses)
+                  and all(f"{name}_bytes" in meta for name in self.TABLES))
+        start = meta["transactions"] if append else 0
+        # A rewrite goes to fresh files; the snapshot in place stays readable until meta.json moves on.
+        old_generation = meta.get("generation", 0) if meta else None
+        generation = old_generation if append else 0 if meta is None else old_generation + 1
+
+        for name, typecode in self.COLUMNS.items():
+            column = getattr(store, name)
+            with open(self._data_file(name, "bin", generation), "r+b" if append else "wb") as f:
+                f.truncate(start * column.itemsize)  # drop rows of an interrupted save
+                f.seek(0, os.SEEK_END)
+                f.write(column[start:].tobytes())
+
+        sizes = {}
+        for name, rows, first in (("addresses", store.addresses, meta["address_count"] if append else 0),
+                                  ("txids", store.txids, start), ("exact_values", store.exact_values, start)):
+            offset = meta[f"{name}_bytes"] if append else 0
+            with open(self._data_file(name, "txt", generation), "r+b" if append else "wb") as f:
+                f.truncate(offset)
+                f.seek(0, os.SEEK_END)
+                f.write("".join(f"{row or ''}\n" for row in itertools.islice(rows, first, None)).encode("utf-8"))
+                sizes[f"{name}_bytes"] = f.tell()
+
+        self.meta = {
+            "version": self.VERSION,
+            "generation": generation,
+            "case_id": case.case_id,
+            "suspected_addresses": list(case.suspected_addresses),
+            "saved": datetime.now().isoformat(timespec="seconds"),
+            "transactions": len(store),
+            "address_count": len(store.addresses),
+            "symbols": list(store.symbols),
+            "sync_state": investigator.sync_state if investigator is not None else (meta or {}).get("sync_state", {}),
+            **sizes,
+        }
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+        if old_generation is not None and old_generation != generation:
+            for name, extension in itertools.chain(((name, "bin") for name in self.COLUMNS),
+                                                   ((name, "txt") for name in self.TABLES)):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._data_file(name, extension, old_generation))
+        return self.path
+
+    def restore(self, investigator=None, exchange_rates=None, price_table=None):
+        """Rebuild the ``InvestigationCase`` and, when given, the investigator's graph and sync state."""
+        if not self.exists():
+            raise FileNotFoundError(f"No snapshot in {self.path}")
+        case = InvestigationCase(self.meta["case_id"], self.meta["suspected_addresses"], exchange_rates,
+                                 price_table=price_table)
+        store = case.store
+        for name, typecode in self.COLUMNS.items():
+            column = array(typecode)
+            column.frombytes(self.column(name).tobytes())
+            setattr(store, name, column)
+        store.addresses = self.table("addresses")
+        store.address_ids = {address: i for i, address in enumerate(store.addresses)}
+        store.txids = [txid or None for txid in self.table("txids")]
+        # Snapshots written before exact values were kept have no such table.
+        store.exact_values = [int(value) if value else None for value in self.table("exact_values")] or [None] * len(self)
+        store.symbols = list(self.meta["symbols"])
+        store.symbol_ids = {symbol: i for i, symbol in enumerate(store.symbols)}
+
+        # Per-address record indices in record order, grouped by address ID (= first-seen order).
+        from_ids, to_ids = self.column("from_ids"), self.column("to_ids")
+        owners = np.concatenate([from_ids, to_ids])
+        indices = np.concatenate([np.arange(len(self))] * 2).astype(np.int32)
+        order = np.lexsort((indices, owners))
+        owners, indices = owners[order], indices[order]
+        bounds = np.flatnonzero(np.diff(owners)) + 1
+        for group in np.split(np.arange(len(owners)), bounds) if len(owners) else ():
+            store.by_address[int(owners[group[0]])] = array("i", indices[group].tobytes())
+        case._fiat_converted = len(store)
+
+        if investigator is not None:
+            graph = nx.DiGraph()
+            graph.add_nodes_from(store.addresses)
+            for f, t, txid, value, exact, timestamp in zip(store.from_ids, store.to_ids, store.txids, store.values,
+                                                           store.exact_values, store.timestamps):
+                add_flow_edge(graph, store.addresses[f], store.addresses[t], txid,
+                              value if exact is None else exact, timestamp)
+            investigator.graph = graph
+            investigator.sync_state = {address: dict(state) for address, state in self.meta["sync_state"].items()}
+            investigator.cycle_detector.rebuild(store)
+        return case
+
+# Bounded-Length Cycle Detection
+class CycleDetector:
+    """Incremental index of circular fund flows up to ``max_length`` hops.
+
+    Edges are interned to integer IDs and kept in successor/predecessor sets
+    plus a per-pair list of ``(timestamp, value, txid)``. Each added edge
+    ``u -> v`` searches for simple paths ``v ~> u`` that close a cycle, pruned
+    by a bounded reverse BFS from ``u``. With ``time_window`` (seconds) a cycle
+    must be time-respecting and span at most the window; with
+    ``value_tolerance`` each hop must carry within that fraction of the
+    previous hop's value.
+    """
+    def __init__(self, max_length=6, time_window=None, value_tolerance=None, max_cycles=10000):
+        if max_length < 2:
+            raise ValueError("max_length must be at least 2")
+        self.max_length = max_length
+        self.time_window = time_window
+        self.value_tolerance = value_tolerance
+        self.max_cycles = max_cycles
+        self.reset()
+
+    def reset(self):
+        self.addresses = []
+        self.address_ids = {}
+        self.succ = {}
+        self.pred = {}
+        self.pair_edges = {}
+        self.cycles = []
+        self._seen = set()
+
+    def rebuild(self, store):
+        """Re-index every record of a ``TransactionStore`` (used when resuming a trace)."""
+        self.reset()
+        for i in range(len(store)):
+            exact = store.exact_values[i]
+            self.add_edge(store.addresses[store.from_ids[i]], store.addresses[store.to_ids[i]],
+                          store.txids[i], store.timestamps[i], store.values[i] if exact is None else exact)
+
+    def _intern(self, address):
+        address_id = self.address_ids.get(address)
+        if address_id is None:
+            address_id = len(self.addresses)
+            self.address_ids[address] = address_id
+            self.addresses.append(address)
+            self.succ[address_id] = set()
+            self.pred[address_id] = set()
+        return address_id
+
+    def add_edge(self, from_addr, to_addr, txid, timestamp=math.nan, value=0.0):
+        """Index one transaction and return the cycles it closes."""
+        u, v = self._intern(from_addr), self._intern(to_addr)
+        if u == v:
+            return []
+        self.succ[u].add(v)
+        self.pred[v].add(u)
+        self.pair_edges.setdefault((u, v), []).append((timestamp, value, txid))
+        if len(self.cycles) >= self.max_cycles:
+            return []
+
+        found = []
+        for path in self._paths(v, u):
+            nodes = (u,) + path
+            pivot = nodes.index(min(nodes))
+            canonical = nodes[pivot:] + nodes[:pivot]
+            if canonical in self._seen:
+                continue
+            cycle = self._qualify(canonical)
+            if cycle is not None:
+                self._seen.add(canonical)
+                self.cycles.append(cycle)
+                found.append(cycle)
+                if len(self.cycles) >= self.max_cycles:
+                    break
+        return found
+
+    def _distances_to(self, target, limit):
+        """Hop distance to ``target`` for nodes within ``limit`` hops, via the predecessor sets."""
+        distances = {target: 0}
+        frontier = [target]
+        for depth in range(1, limit + 1):
+            next_frontier = []
+            for node in frontier:
+                for prev in self.pred[node]:
+                    if prev not in distances:
+                        distances[prev] = depth
+                        next_frontier.append(prev)
+            frontier = next_frontier
+        return distances
+
+    def _paths(self, source, target):
+        """Simple paths ``source ~> target`` with at most ``max_length - 1`` hops."""
+        budget = self.max_length - 1
+        distances = self._distances_to(target, budget)
+        if source not in distances:
+            return
+        path = [source]
+        on_path = {source}
+        stack = [iter(self.succ[source])]
+        while stack:
+            for node in stack[-1]:
+                if node == target:
+                    yield tuple(path)
+                    continue
+                remaining = budget - len(path)
+                if node in on_path or distances.get(node, budget + 1) > remaining:
                     continue
+                path.append(node)
+                on_path.add(node)
+                stack.append(iter(self.succ[node]))
+                break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+
+    def _qualify(self, nodes):
+        """Pick one transaction per hop satisfying the time and value constraints, or None."""
+        hops = [(nodes[i], nodes[(i + 1) % len(nodes)]) for i in range(len(nodes))]
+        constrained = self.time_window is not None or self.value_tolerance is not None
+        rotations = range(len(hops)) if constrained else range(1)
+        for start in rotations:
+            rotated = hops[start:] + hops[:start]
+            firsts = [self._next_edge(self.pair_edges[rotated[0]], None)]
+            if constrained:
+                # Sweep every transfer of the first hop in time order; the earliest need not fit the window.
+                firsts = sorted((edge for edge in self.pair_edges[rotated[0]]
+                                 if self.time_window is None or not math.isnan(edge[0])),
+                                key=lambda edge: (math.isnan(edge[0]), edge[0]))
+            chosen = self._chain(rotated, firsts)
+            if chosen is not None:
+                order = [hop[0] for hop in rotated]
+                return {
+                    "addresses": [self.addresses[node] for node in order],
+                    "length": len(order),
+                    "txids": [edge[2] for edge in chosen],
+                    "values": [edge[1] for edge in chosen],
+                    "start_time": None if math.isnan(chosen[0][0]) else chosen[0][0],
+                    "end_time": None if math.isnan(chosen[-1][0]) else chosen[-1][0],
+                }
+        return None
 
-                visited.add(addr)
-                address_info = self.api.get_address_info(addr, limit)
-                if not address_info:
-                    print(f"No transactions found for address {addr}.")
+    def _chain(self, hops, firsts):
+        """One transfer per hop, starting from the first of ``firsts`` that completes the cycle in time."""
+        for first in firsts:
+            if first is None:
+                return None
+            chosen = [first]
+            for hop in hops[1:]:
+                edge = self._next_edge(self.pair_edges[hop], chosen[-1])
+                if edge is None:
+                    break
+                chosen.append(edge)
+            else:
+                if self.time_window is None or chosen[-1][0] - chosen[0][0] <= self.time_window:
+                    return chosen
+                continue
+            if self.value_tolerance is None:
+                # Only time constrains the chain, and a later start cannot complete it either.
+                return None
+        return None
+
+    def _next_edge(self, edges, previous):
+        """Earliest parallel edge that may follow ``previous`` on a cycle."""
+        best = None
+        for edge in edges:
+            if previous is not None:
+                if self.time_window is not None and not edge[0] >= previous[0]:
                     continue
+                if self.value_tolerance is not None and previous[1] > 0 and \
+                        abs(edge[1] - previous[1]) > self.value_tolerance * previous[1]:
+                    continue
+            elif self.time_window is not None and math.isnan(edge[0]):
+                continue
+            if best is None or edge[0] < best[0]:
+                best = edge
+        return best
 
-                transactions = address_info
-
-                for tx in transactions:
-                    tx_id = tx.get("hash") or tx.get("transactionHash")
-                    from_addr = tx.get("from")
-                    to_addr = tx.get("to")
-                    if from_addr and to_addr:
-                        # Add nodes and edges to the graph
-                        self.graph.add_node(from_addr)
-                        self.graph.add_node(to_addr)
-                        self.graph.add_edge(from_addr, to_addr, txid=tx_id)
-
-                        # Add transaction to the case
-                        case.add_transaction(from_addr, to_addr, tx_id, tx)
-
-                        # Add to the queue for further exploration
-                        queue.append((to_addr, level + 1))
-                        
-                        # Track transaction history for pattern analysis
-                        transaction_history.setdefault(from_addr, []).append(to_addr)
-
-                    total_transactions += 1
-                    pbar.update(1)
-
-        print(f"Total Transactions Traced for {address}: {total_transactions}")
-        self.detect_circular_transactions(transaction_history)
-
-    def detect_circular_transactions(self, transaction_history):
-        """Detect circular transactions within the network."""
-        print("\n=== Detecting Circular Transactions ===")
-        for sender, receivers in transaction_history.items():
-            for receiver in receivers:
-                if sender in transaction_history.get(receiver, []):
-                    print(f"Circular transaction detected between {sender} and {receiver}")
+# Crypto Investigator Class with Transaction Tracking and Pattern Analysis
+class CryptoInvestigator:
+    GRAPH_BACKENDS = ("networkx", "csr")
 
+    def __init__(self, api, kyc_aml_data, graph_backend="networkx", cycle_detector=None):
+        if graph_backend not in self.GRAPH_BACKENDS:
+            raise ValueError(f"Unknown graph backend: {graph_backend}")
+        self.api = api
+        self.kyc_aml_data = kyc_aml_data
+        self.graph = nx.DiGraph()  
+        self.graph_backend = graph_backend
+        self.cycle_detector = cycle_detector or CycleDetector()
+        self.sync_state = {}  # address -> {"block": newest block fetched, "level": trace level}
+        self._csr = None
+        self._flow = None
+
+    @property
+    def graph_version(self):
+        """Changes whenever nodes or edges are added; the traced graph is append-only."""
+        return (id(self.graph), self.graph.number_of_nodes(), self.graph.number_of_edges())
+
+    def csr_graph(self):
+        """Integer-indexed CSR view of ``graph``, rebuilt only when the graph has changed."""
+        if self._csr is None or self._csr[0] != self.graph_version:
+            self._csr = (self.graph_version, CSRGraph.from_networkx(self.graph))
+        return self._csr[1]
+
+    def flow_index(self, case):
+        """``FlowIndex`` over the case's transactions, rebuilt only when new ones were added."""
+        if self._flow is None or self._flow.store is not case.store or self._flow.size != len(case.store):
+            self._flow = FlowIndex(case.store)
+        return self._flow
+
+    @instrumented("flows")
+    def trace_fund_flows(self, case, source, targets, max_hops=4, max_paths=10):
+        """Time-respecting fund-flow paths from ``source`` to each target address."""
+        index = self.flow_index(case)
+        flows = {}
+        for target in targets:
+            paths = index.paths(source, target, max_hops=max_hops, max_paths=max_paths)
+            flows[target] = paths
+            if paths:
+                logger.info(f"Funds from {source} reach {target} in {paths[0]['hops']} hops "
+                            f"(up to {paths[0]['amount']:g} along the largest of {len(paths)} paths).",
+                            extra={"source": source, "target": target, "paths": len(paths)})
+            else:
+                logger.info(f"No fund flow from {source} to {target} within {max_hops} hops.",
+                            extra={"source": source, "target": target, "paths": 0})
+        return flows
+
+    @instrumented("trace")
+    def trace_transactions(self, address, case, depth=2, limit=20, workers=1, scheduler=None, progress=True,
+                           incremental=False):
+        """Trace transactions to a specified depth with additional pattern analysis.
+
+        The frontier, budgets and checkpoints are managed by ``scheduler`` (a
+        FIFO ``TraceScheduler`` by default). If the scheduler's checkpoint exists
+        the trace resumes from it; it is kept while the frontier is not empty
+        and removed when the trace completes. With ``workers`` > 1 batches of frontier
+        addresses are fetched concurrently on a bounded thread pool and merged
+        in pop order, so a FIFO trace matches the serial one exactly.
+
+        ``sync_state`` records the newest block fetched per address. With
+        ``incremental`` (a case restored from a ``CaseSnapshot``) every
+        previously traced address is queued again at its old level but only
+        activity after its recorded block is fetched; an address now reached
+        at a shallower level is fetched in full, since its older transactions
+        lead to addresses that were beyond the depth before.
+        """
+        scheduler = scheduler or TraceScheduler()
+        scheduler.params = {"address": address, "depth": depth, "limit": limit, "incremental": bool(incremental)}
+        if scheduler.load(self, case):
+            logger.info(f"Resuming trace from {scheduler.checkpoint_path}: "
+                        f"{len(scheduler.frontier)} queued, {len(scheduler.visited)} visited.",
+                        extra={"checkpoint": scheduler.checkpoint_path})
+            self.cycle_detector.rebuild(case.store)
+        else:
+            scheduler.push(address, 0)
+            if incremental:
+                for synced_address, state in self.sync_state.items():
+                    if state["level"] <= depth:
+                        scheduler.push(synced_address, state["level"])
+        scheduler.start_clock()
+
+        # Providers with a multi-address endpoint get whole chunks of the frontier per request.
+        chunk_size = max(1, self.api.batch_size)
+        batch_size = (max(1, workers) * 4 if workers > 1 else 1) * chunk_size
+        stop_reason = None
+        # Transactions already in the case (resumed or restored) are not added again.
+        seen_txids = set(case.store.txids)
+
+        def fetch(entries):
+            since_blocks = None
+            if incremental:
+                since_blocks = {addr: state["block"] for _, _, addr, level in entries
+                                for state in (self.sync_state.get(addr),) if state and state["level"] <= level}
+            return self.api.get_addresses_info([entry[2] for entry in entries], limit, since_blocks=since_blocks)
+
+        with tqdm(total=len(scheduler.frontier), desc="Tracing Addresses", unit="addr", disable=not progress) as pbar, \
+                ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            try:
+                while scheduler.frontier:
+                    stop_reason = scheduler.budget_exhausted(self.graph)
+                    if stop_reason:
+                        break
+                    batch = scheduler.pop_batch(scheduler.clip_batch(batch_size))
+                    if not batch:
+                        break
+
+                    chunks = [batch[i:i + chunk_size] for i in range(0, len(batch), chunk_size)]
+                    try:
+                        if workers > 1:
+                            results = list(itertools.chain.from_iterable(pool.map(fetch, chunks)))
+                        else:
+                            results = list(itertools.chain.from_iterable(map(fetch, chunks)))
+                    except KeyboardInterrupt:
+                        scheduler.requeue(batch)
+                        raise
+                    scheduler.api_calls += len(batch)
+
+                    for (_, _, addr, level), address_info in zip(batch, results):
+                        self._record_sync(addr, level, address_info)
+                        if not address_info:
+                            logger.info(f"No transactions found for address {addr}.", extra={"address": addr})
+                            continue
+
+                        for tx in address_info:
+                            tx_id = tx.get("hash") or tx.get("transactionHash")
+                            # The same transaction is listed under each address it touches; it is
+                            # recorded once but may still lead on to receivers not expanded yet.
+                            known = tx_id is not None and tx_id in seen_txids
+                            if tx_id is not None:
+                                seen_txids.add(tx_id)
+                            timestamp = _to_float(tx.get("time") or tx.get("timeStamp"), math.nan)
+                            for from_addr, to_addr, value in self.api.extract_edges(tx):
+                                if not known:
+                                    # Add nodes and edges to the graph
+                                    self.graph.add_node(from_addr)
+                                    self.graph.add_node(to_addr)
+                                    add_flow_edge(self.graph, from_addr, to_addr, tx_id, value, timestamp)
+
+                                    # Add transaction to the case
+                                    case.add_transaction(from_addr, to_addr, tx_id, tx, value=value)
+
+                                    # Index the edge for incremental cycle detection
+                                    self.cycle_detector.add_edge(from_addr, to_addr, tx_id, timestamp=timestamp,
+                                                                 value=value)
+
+                                # Queue the receiver for further exploration
+                                if level < depth:
+                                    scheduler.push(to_addr, level + 1, value=value,
+                                                   timestamp=0.0 if math.isnan(timestamp) else timestamp)
+
+                            if not known:
+                                scheduler.total_transactions += 1
+
+                    # The frontier grows as addresses are expanded, so the total is re-estimated per batch.
+                    pbar.total = pbar.n + len(batch) + len(scheduler.frontier)
+                    pbar.set_postfix(tx=scheduler.total_transactions, refresh=False)
+                    pbar.update(len(batch))
+
+                    if scheduler.checkpoint_due():
+                        scheduler.save(self, case)
+            except KeyboardInterrupt:
+                scheduler.save(self, case)
+                if scheduler.checkpoint_path:
+                    logger.warning(f"Trace interrupted; checkpoint saved to {scheduler.checkpoint_path}.",
+                                   extra={"checkpoint": scheduler.checkpoint_path})
+                raise
+
+        if scheduler.frontier:
+            scheduler.save(self, case)
+        else:
+            scheduler.discard()
+        if stop_reason:
+            logger.warning(f"Trace stopped early: {stop_reason} reached with {len(scheduler.frontier)} addresses queued.",
+                           extra={"reason": stop_reason, "queued": len(scheduler.frontier)})
+        case.convert_values_to_fiat()
+        metrics = PipelineMetrics.shared()
+        metrics.gauge("graph_nodes", self.graph.number_of_nodes())
+        metrics.gauge("graph_edges", self.graph.number_of_edges())
+        metrics.gauge("transactions", len(case.store))
+        metrics.gauge("addresses_visited", len(scheduler.visited))
+        metrics.gauge("addresses_queued", len(scheduler.frontier))
+        logger.info(f"Total Transactions Traced for {address}: {scheduler.total_transactions}",
+                    extra={"address": address, "transactions": scheduler.total_transactions,
+                           "api_calls": scheduler.api_calls})
+        cycles = self.detect_circular_transactions()
+        logger.info(f"Circular flows detected: {len(cycles)}", extra={"cycles": len(cycles)})
+
+    def _record_sync(self, addr, level, txs):
+        state = self.sync_state.setdefault(addr, {"block": None, "level": level})
+        state["level"] = min(state["level"], level)
+        blocks = [block for block in map(self.api.block_height, txs or ()) if block is not None]
+        if blocks:
+            state["block"] = max(blocks + ([state["block"]] if state["block"] is not None else []))
+
+    @instrumented("cycles")
+    def detect_circular_transactions(self):
+        """Return the circular flows indexed so far, shortest first."""
+        return sorted(self.cycle_detector.cycles, key=lambda cycle: (cycle["length"], cycle["addresses"]))
+
+    @instrumented("watchlist")
+    def screen_watchlists(self):
+        """Screen every address in the traced graph against the KYC/AML watchlists at once."""
+        if self.kyc_aml_data is None:
+            return {}
+        return self.kyc_aml_data.screen_addresses(self.graph.nodes)
+
+    @instrumented("mixers")
     def detect_mixers_or_tumblers(self):
         """Detect potential mixer or tumbler transactions."""
-        print("\n=== Detecting Potential Mixer/Tumbler Activity ===")
+        logger.info("\n=== Detecting Potential Mixer/Tumbler Activity ===")
         mixers = []
-        for node in self.graph.nodes:
-            if len(list(self.graph.successors(node))) > 10:  # Heuristic: more than 10 outgoing transactions
-                print(f"Potential mixer or tumbler detected at address: {node}")
-                mixers.append(node)
+        csr = self.csr_graph()
+        for i in np.nonzero(csr.out_degree() > 10)[0]:  # Heuristic: more than 10 distinct receivers
+            node = csr.nodes[i]
+            logger.info(f"Potential mixer or tumbler detected at address: {node}", extra={"address": node})
+            mixers.append(node)
         return mixers
 
+# Integer-Indexed Sparse Graph Backend
+class CSRGraph:
+    """Compressed sparse row adjacency of a transaction graph keyed by integer IDs.
+
+    ``nodes[i]`` is the address of node ``i``; parallel edges are collapsed.
+    Analytics run on NumPy arrays (and SciPy's csgraph routines when SciPy is
+    installed) and return dicts keyed by address.
+    """
+    def __init__(self, nodes, sources, targets):
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        n = len(self.nodes)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if len(sources):
+            pairs = np.unique(sources * max(n, 1) + targets)
+            sources, targets = pairs // max(n, 1), pairs % max(n, 1)
+        self.indptr, self.indices = self._compress(n, sources, targets)
+        self.rev_indptr, self.rev_indices = self._compress(n, targets, sources)
+
+    @staticmethod
+    def _compress(n, sources, targets):
+        order = np.lexsort((targets, sources))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        return indptr, targets[order].astype(np.int32)
+
+    @classmethod
+    def from_networkx(cls, graph):
+        nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = np.fromiter(
+            (index[x] for edge in graph.edges for x in edge), dtype=np.int64,
+            count=2 * graph.number_of_edges(),
+        ).reshape(-1, 2)
+        return cls(nodes, edges[:, 0], edges[:, 1])
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.diff(self.rev_indptr)
+
+    def successors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def predecessors(self, i):
+        return self.rev_indices[self.rev_indptr[i]:self.rev_indptr[i + 1]]
+
+    def to_scipy(self, reverse=False):
+        """SciPy CSR matrix of the adjacency (or of its transpose)."""
+        indptr, indices = (self.rev_indptr, self.rev_indices) if reverse else (self.indptr, self.indices)
+        n = len(self.nodes)
+        return sparse.csr_matrix((np.ones(len(indices), dtype=np.int8), indices, indptr), shape=(n, n))
+
+    def _by_node(self, values):
+        return {node: float(value) for node, value in zip(self.nodes, values)}
+
+    def degree_centrality(self):
+        """In+out degree over n-1, matching ``networkx.degree_centrality``."""
+        n = len(self.nodes)
+        if n <= 1:
+            return {node: 1.0 for node in self.nodes}
+        return self._by_node((self.out_degree() + self.in_degree()) / (n - 1))
+
+    def _incoming_distances(self, sources):
+        """Rows of hop distances *to* each node in ``sources`` (inf when unreachable)."""
+        if csgraph is not None:
+            return csgraph.shortest_path(self.to_scipy(reverse=True), method="D", directed=True,
+                                         unweighted=True, indices=sources)
+        distances = np.full((len(sources), len(self.nodes)), np.inf)
+        for row, source in enumerate(sources):
+            distances[row, source] = 0
+            frontier, depth = np.array([source]), 0
+            while len(frontier):
+                depth += 1
+                neighbours = np.concatenate([self.predecessors(i) for i in frontier])
+                neighbours = np.unique(neighbours[np.isinf(distances[row, neighbours])])
+                distances[row, neighbours] = depth
+                frontier = neighbours
+        return distances
+
+    def closeness_centrality(self, chunk_size=256):
+        """Wasserman-Faust closeness on incoming distances, matching NetworkX's directed definition."""
+        n = len(self.nodes)
+        closeness = np.zeros(n)
+        if n <= 1:
+            return self._by_node(closeness)
+        for start in range(0, n, chunk_size):
+            sources = np.arange(start, min(start + chunk_size, n))
+            distances = self._incoming_distances(sources)
+            reachable = np.isfinite(distances)
+            total = np.where(reachable, distances, 0).sum(axis=1)
+            found = reachable.sum(axis=1) - 1
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.where(total > 0, (found / total) * (found / (n - 1)), 0.0)
+            closeness[sources] = scores
+        return self._by_node(closeness)
+
+    def weakly_connected_components(self):
+        """List of address sets, one per weakly connected component."""
+        n = len(self.nodes)
+        if csgraph is not None:
+            _, labels = csgraph.connected_components(self.to_scipy(), directed=True, connection="weak")
+        else:
+            # Union-find over the edge list with path halving.
+            parent = np.arange(n)
+
+            def find(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            sources = np.repeat(np.arange(n), np.diff(self.indptr))
+            for a, b in zip(sources, self.indices):
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+            labels = np.array([find(i) for i in range(n)])
+        components = {}
+        for node, label in zip(self.nodes, labels):
+            components.setdefault(label, set()).add(node)
+        return list(components.values())
+
+# Fund-Flow Path Queries
+def add_flow_edge(graph, from_addr, to_addr, txid, value, timestamp):
+    """Add one transfer to ``graph``, aggregating parallel transfers into the edge's attributes.
+
+    ``txid`` stays the latest transaction; ``count``, ``total_value`` and
+    ``first_timestamp``/``last_timestamp`` (None while unknown) cover them all.
+    """
+    timestamp = None if timestamp is None or math.isnan(timestamp) else timestamp
+    data = graph.get_edge_data(from_addr, to_addr)
+    if data is None:
+        graph.add_edge(from_addr, to_addr, txid=txid, count=1, total_value=value,
+                       first_timestamp=timestamp, last_timestamp=timestamp)
+        return
+    data["txid"] = txid
+    data["count"] += 1
+    data["total_value"] += value
+    if timestamp is not None:
+        first, last = data["first_timestamp"], data["last_timestamp"]
+        data["first_timestamp"] = timestamp if first is None else min(first, timestamp)
+        data["last_timestamp"] = timestamp if last is None else max(last, timestamp)
+
+def _gather_neighbours(indptr, indices, frontier):
+    """All (source, neighbour) pairs of a CSR adjacency for the nodes in ``frontier``."""
+    starts, ends = indptr[frontier], indptr[frontier + 1]
+    counts = ends - starts
+    total = int(counts.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    positions = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts) + np.arange(total)
+    return np.repeat(frontier, counts), indices[positions].astype(np.int64), positions
+
+class FlowIndex:
+    """Aggregated fund-flow edges over a ``TransactionStore`` for path queries between addresses.
+
+    Parallel transactions are merged into one edge per address pair with
+    ``count``, ``total_value`` and first/last timestamps, and each edge keeps
+    its transactions sorted by time for time-respecting queries (unknown
+    timestamps sort first). Strongly connected components are ranked
+    topologically once: an address can only reach one in another component
+    of higher rank, which prunes both directions of every search.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.size = len(store)
+        senders, receivers, values, timestamps = PatternDetector.columns(store)
+        self.csr = CSRGraph(store.addresses, senders, receivers)
+        n = len(store.addresses)
+
+        # Edge k is the k-th (sender, receiver) pair in CSR order.
+        codes = senders.astype(np.int64) * max(n, 1) + receivers
+        _, edge_ids = np.unique(codes, return_inverse=True)
+        edges = self.csr.number_of_edges()
+        self.count = np.bincount(edge_ids, minlength=edges)
+        self.total_value = np.bincount(edge_ids, weights=values, minlength=edges)
+        self.first_timestamp = np.full(edges, np.inf)
+        self.last_timestamp = np.full(edges, -np.inf)
+        known = ~np.isnan(timestamps)
+        np.minimum.at(self.first_timestamp, edge_ids[known], timestamps[known])
+        np.maximum.at(self.last_timestamp, edge_ids[known], timestamps[known])
+        self.first_timestamp[np.isinf(self.first_timestamp)] = np.nan
+        self.last_timestamp[np.isinf(self.last_timestamp)] = np.nan
+
+        sort_times = np.where(known, timestamps, -np.inf)
+        order = np.lexsort((sort_times, edge_ids))
+        self._tx_times = sort_times[order]
+        self._tx_value_sums = np.concatenate(([0.0], np.cumsum(values[order])))
+        self._tx_bounds = np.searchsorted(edge_ids[order], np.arange(edges + 1))
+
+        self._rank_components()
+
+    def _rank_components(self):
+        """Label strongly connected components and give each a topological rank."""
+        n = self.csr.number_of_nodes()
+        sources = np.repeat(np.arange(n), np.diff(self.csr.indptr))
+        targets = self.csr.indices.astype(np.int64)
+        if csgraph is not None:
+            _, scc = csgraph.connected_components(self.csr.to_scipy(), directed=True, connection="strong")
+        else:
+            graph = nx.DiGraph()
+            graph.add_nodes_from(range(n))
+            graph.add_edges_from(zip(sources.tolist(), targets.tolist()))
+            scc = np.zeros(n, dtype=np.int64)
+            for label, members in enumerate(nx.strongly_connected_components(graph)):
+                scc[list(members)] = label
+        k = int(scc.max()) + 1 if n else 0
+        between = scc[sources] != scc[targets]
+        condensed = CSRGraph(range(k), scc[sources][between], scc[targets][between])
+
+        # Longest-path layering (Kahn): an edge always goes to a strictly higher rank.
+        indegree = condensed.in_degree().copy()
+        rank = np.zeros(k, dtype=np.int64)
+        frontier, level = np.flatnonzero(indegree == 0), 0
+        while len(frontier):
+            rank[frontier] = level
+            _, successors, _ = _gather_neighbours(condensed.indptr, condensed.indices, frontier)
+            np.subtract.at(indegree, successors, 1)
+            frontier = np.unique(successors[indegree[successors] == 0])
+            level += 1
+        self.component = scc
+        self.rank = rank[scc]
+
+    def _may_reach(self, nodes, target):
+        return (self.component[nodes] == self.component[target]) | (self.rank[nodes] < self.rank[target])
+
+    def _may_be_reached(self, source, nodes):
+        return (self.component[nodes] == self.component[source]) | (self.rank[nodes] > self.rank[source])
+
+    def _id(self, address):
+        address_id = self.store.address_ids.get(address)
+        if address_id is None and isinstance(address, str):
+            address_id = self.store.address_ids.get(address.lower())
+        return address_id
+
+    def edge(self, from_addr, to_addr):
+        """Aggregated transfers from one address to another, or None if there are none."""
+        source, target = self._id(from_addr), self._id(to_addr)
+        if source is None or target is None:
+            return None
+        row = self.csr.successors(source)
+        position = int(np.searchsorted(row, target))
+        if position >= len(row) or row[position] != target:
+            return None
+        return self._edge_summary(int(self.csr.indptr[source]) + position)
+
+    def _edge_summary(self, k):
+        def optional(value):
+            return None if np.isnan(value) else float(value)
+        return {"count": int(self.count[k]), "total_value": float(self.total_value[k]),
+                "first_timestamp": optional(self.first_timestamp[k]),
+                "last_timestamp": optional(self.last_timestamp[k])}
+
+    def shortest_path(self, from_addr, to_addr, max_hops=None):
+        """Fewest-hop route as a list of addresses (bidirectional BFS), or None beyond ``max_hops``."""
+        source, target = self._id(from_addr), self._id(to_addr)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return [self.store.addresses[source]]
+        if not self._may_reach(np.array([source]), target)[0]:
+            return None
+        n = self.csr.number_of_nodes()
+        max_hops = n if max_hops is None else max_hops
+        parents = {True: np.full(n, -1, dtype=np.int64), False: np.full(n, -1, dtype=np.int64)}
+        seen = {True: np.zeros(n, dtype=bool), False: np.zeros(n, dtype=bool)}
+        frontiers = {True: np.array([source]), False: np.array([target])}
+        seen[True][source] = seen[False][target] = True
+        hops = 0
+        while len(frontiers[True]) and len(frontiers[False]) and hops < max_hops:
+            forward = len(frontiers[True]) <= len(frontiers[False])
+            if forward:
+                origins, reached, _ = _gather_neighbours(self.csr.indptr, self.csr.indices, frontiers[True])
+                keep = ~seen[True][reached] & self._may_reach(reached, target)
+            else:
+                origins, reached, _ = _gather_neighbours(self.csr.rev_indptr, self.csr.rev_indices,
+                                                         frontiers[False])
+                keep = ~seen[False][reached] & self._may_be_reached(source, reached)
+            reached, first = np.unique(reached[keep], return_index=True)
+            parents[forward][reached] = origins[keep][first]
+            seen[forward][reached] = True
+            frontiers[forward] = reached
+            hops += 1
+            meeting = reached[seen[not forward][reached]]
+            if len(meeting):
+                return self._join(parents, int(meeting[0]))
+        return None
+
+    def _join(self, parents, middle):
+        head, node = [], middle
+        while node != -1:
+            head.append(node)
+            node = parents[True][node]
+        tail, node = [], parents[False][middle]
+        while node != -1:
+            tail.append(node)
+            node = parents[False][node]
+        return [self.store.addresses[i] for i in head[::-1] + tail]
+
+    def reachable(self, from_addr, to_addr, max_hops=None):
+        return self.shortest_path(from_addr, to_addr, max_hops) is not None
+
+    def _hop(self, k, after, until):
+        """Transfers on edge ``k`` inside [after, until]: (count, amount, earliest timestamp) or None."""
+        start, end = self._tx_bounds[k], self._tx_bounds[k + 1]
+        times = self._tx_times[start:end]
+        lo = start + int(np.searchsorted(times, after, side="left"))
+        hi = start + int(np.searchsorted(times, until, side="right"))
+        if lo >= hi:
+            return None
+        return hi - lo, self._tx_value_sums[hi] - self._tx_value_sums[lo], self._tx_times[lo]
+
+    def paths(self, from_addr, to_addr, max_hops=4, max_paths=100, time_respecting=True, start=None, end=None):
+        """Simple paths of at most ``max_hops`` hops with the amount that could have flowed along each.
+
+        With ``time_respecting`` every hop must use transfers at or after the
+        earliest usable transfer of the previous hop. A hop's amount is the
+        value of those usable transfers and a path's ``amount`` is its smallest
+        hop. ``start``/``end`` bound the transfer timestamps. Returns the
+        ``max_paths`` largest paths, largest amount first (fewer hops first on
+        ties); a partial path already smaller than every kept path is pruned.
+        """
+        source, target = self._id(from_addr), self._id(to_addr)
+        if source is None or target is None or source == target:
+            return []
+        if not self._may_reach(np.array([source]), target)[0]:
+            return []
+        until = np.inf if end is None else end
+
+        # Hop distances to the target, restricted to nodes that can also be reached from the source.
+        n = self.csr.number_of_nodes()
+        distance = np.full(n, max_hops + 1, dtype=np.int64)
+        distance[target] = 0
+        frontier = np.array([target])
+        for depth in range(1, max_hops + 1):
+            _, reached, _ = _gather_neighbours(self.csr.rev_indptr, self.csr.rev_indices, frontier)
+            reached = np.unique(reached[(distance[reached] > depth) & self._may_be_reached(source, reached)])
+            distance[reached] = depth
+            frontier = reached
+        if distance[source] > max_hops:
+            return []
+
+        best = []  # min-heap of (amount, -hops, -sequence, path): the weakest kept path on top
+        sequence = itertools.count()
+        path, hops, bottlenecks = [source], [], [np.inf]
+        stack = [self._moves(source, -np.inf if start is None else start, until)]
+        while stack:
+            move = next(stack[-1], None)
+            if move is None:
+                stack.pop()
+                path.pop()
+                if hops:
+                    hops.pop()
+                    bottlenecks.pop()
+                continue
+            node, k, hop = move
+            if node in path or distance[node] > max_hops - len(hops) - 1:
+                continue
+            # A path's amount only shrinks as it grows.
+            bottleneck = min(bottlenecks[-1], hop[1])
+            if len(best) >= max_paths and bottleneck < best[0][0]:
+                continue
+            if node == target:
+                entry = (bottleneck, -(len(hops) + 1), -next(sequence), (path + [node], hops + [(k, hop)]))
+                if len(best) < max_paths:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heappushpop(best, entry)
+                continue
+            path.append(node)
+            hops.append((k, hop))
+            bottlenecks.append(bottleneck)
+            stack.append(self._moves(node, hop[2] if time_respecting else -np.inf, until))
+        return [self._describe(*entry[3]) for entry in sorted(best, reverse=True)]
+
+    def _moves(self, node, after, until):
+        """Usable outgoing edges of ``node``, largest aggregate value first."""
+        first, last = int(self.csr.indptr[node]), int(self.csr.indptr[node + 1])
+        for k in sorted(range(first, last), key=lambda k: -self.total_value[k]):
+            hop = self._hop(k, after, until)
+            if hop is not None:
+                yield int(self.csr.indices[k]), k, hop
+
+    def _describe(self, nodes, hops):
+        addresses = [self.store.addresses[i] for i in nodes]
+        steps = []
+        for (k, (count, amount, earliest)), from_addr, to_addr in zip(hops, addresses, addresses[1:]):
+            steps.append({"from": from_addr, "to": to_addr, "transactions": int(count), "amount": float(amount),
+                          "earliest_timestamp": None if np.isinf(earliest) else float(earliest),
+                          **self._edge_summary(k)})
+        times = [step["earliest_timestamp"] for step in steps if step["earliest_timestamp"] is not None]
+        return {
+            "addresses": addresses,
+            "hops": len(steps),
+            "amount": min(step["amount"] for step in steps),
+            "start_time": min(times) if times else None,
+            "end_time": max(times) if times else None,
+            "steps": steps,
+        }
+
+# Vectorised Pattern Detection
+class PatternDetector:
+    """Fan-out/fan-in bursts, equal-denomination outputs and peel chains over a ``TransactionStore``.
+
+    Per-address statistics come from one NumPy pass over the store's columns;
+    records without a timestamp are ignored by the time-windowed detectors.
+    """
+    def __init__(self, burst_window=3600, burst_min_count=10, equal_min_count=5,
+                 peel_ratio=0.9, peel_max_outputs=3, peel_window=86400, peel_min_hops=3):
+        self.burst_window = burst_window
+        self.burst_min_count = burst_min_count
+        self.equal_min_count = equal_min_count
+        self.peel_ratio = peel_ratio
+        self.peel_max_outputs = peel_max_outputs
+        self.peel_window = peel_window
+        self.peel_min_hops = peel_min_hops
+
+    @staticmethod
+    def columns(store):
+        """NumPy views of the store columns used by the detectors."""
+        return (np.frombuffer(store.from_ids, dtype=np.int32) if len(store) else np.zeros(0, np.int32),
+                np.frombuffer(store.to_ids, dtype=np.int32) if len(store) else np.zeros(0, np.int32),
+                np.frombuffer(store.values, dtype=np.float64) if len(store) else np.zeros(0),
+                np.frombuffer(store.timestamps, dtype=np.float64) if len(store) else np.zeros(0))
+
+    def address_stats(self, store):
+        """Per-address degree, value and timestamp statistics, indexed by address ID."""
+        senders, receivers, values, timestamps = self.columns(store)
+        n = len(store.addresses)
+        first_seen = np.full(n, np.inf)
+        last_seen = np.full(n, -np.inf)
+        timed = ~np.isnan(timestamps)
+        for ids in (senders, receivers):
+            np.minimum.at(first_seen, ids[timed], timestamps[timed])
+            np.maximum.at(last_seen, ids[timed], timestamps[timed])
+        max_out = np.zeros(n)
+        np.maximum.at(max_out, senders, values)
+        return {
+            "out_degree": np.bincount(senders, minlength=n),
+            "in_degree": np.bincount(receivers, minlength=n),
+            "value_out": np.bincount(senders, weights=values, minlength=n),
+            "value_in": np.bincount(receivers, weights=values, minlength=n),
+            "max_value_out": max_out,
+            "first_seen": first_seen,
+            "last_seen": last_seen,
+        }
+
+    def _bursts(self, ids, timestamps):
+        """Largest number of records per address inside any ``burst_window``-second window."""
+        timed = ~np.isnan(timestamps)
+        ids, timestamps = ids[timed], timestamps[timed]
+        if not len(ids):
+            return {}
+        # Shift each address's timestamps into its own disjoint band so one
+        # sorted array and searchsorted cover every address at once.
+        base = timestamps - timestamps.min()
+        band = base.max() + self.burst_window + 1
+        shifted = ids.astype(np.float64) * band + base
+        order = np.argsort(shifted, kind="stable")
+        shifted = shifted[order]
+        counts = np.searchsorted(shifted, shifted + self.burst_window, side="right") - np.arange(len(shifted))
+        best = np.zeros(ids.max() + 1, dtype=np.int64)
+        np.maximum.at(best, ids[order], counts)
+        flagged = np.nonzero(best >= self.burst_min_count)[0]
+        return {int(i): int(best[i]) for i in flagged}
+
+    def _equal_outputs(self, senders, values):
+        """Senders with at least ``equal_min_count`` outputs of one identical non-zero amount."""
+        paid = values > 0
+        if not paid.any():
+            return []
+        pairs, counts = np.unique(np.stack([senders[paid].astype(np.float64), values[paid]], axis=1),
+                                  axis=0, return_counts=True)
+        hits = counts >= self.equal_min_count
+        return [(int(sender), float(value), int(count))
+                for (sender, value), count in zip(pairs[hits], counts[hits])]
+
+    def _peel_chains(self, store, stats):
+        """Chains where each hop forwards most of what it received to a single next address."""
+        senders, receivers, values, timestamps = self.columns(store)
+        n = len(store.addresses)
+        if not len(senders):
+            return []
+        # The largest output of each address and where it went.
+        order = np.lexsort((values, senders))
+        last = np.r_[senders[order][1:] != senders[order][:-1], True]
+        largest = order[last]
+        next_hop = np.full(n, -1, dtype=np.int64)
+        next_hop[senders[largest]] = receivers[largest]
+        sent_at = np.full(n, np.nan)
+        sent_at[senders[largest]] = timestamps[largest]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            forwarded = stats["max_value_out"] / stats["value_in"]
+        peel = ((stats["out_degree"] >= 1) & (stats["out_degree"] <= self.peel_max_outputs)
+                & (stats["value_in"] > 0) & (forwarded >= self.peel_ratio) & (forwarded <= 1.0 + 1e-9))
+        if self.peel_window is not None:
+            held = sent_at - stats["first_seen"]
+            peel &= ~(held > self.peel_window)
+
+        chains = []
+        has_peel_parent = np.zeros(n, dtype=bool)
+        parents = np.nonzero(peel & (next_hop >= 0))[0]
+        has_peel_parent[next_hop[parents]] = True
+        for start in np.nonzero(peel & ~has_peel_parent)[0]:
+            chain, node, seen = [int(start)], int(start), {int(start)}
+            while peel[node] and next_hop[node] >= 0 and int(next_hop[node]) not in seen:
+                node = int(next_hop[node])
+                chain.append(node)
+                seen.add(node)
+            if len(chain) - 1 >= self.peel_min_hops:
+                chains.append({
+                    "addresses": [store.addresses[i] for i in chain],
+                    "hops": len(chain) - 1,
+                    "start_value": float(stats["max_value_out"][chain[0]]),
+                    "end_value": float(stats["value_in"][chain[-1]]),
+                })
+        return chains
+
+    @instrumented("patterns")
+    def detect(self, store):
+        """Run every detector and return a dict of findings keyed by pattern."""
+        senders, receivers, values, timestamps = self.columns(store)
+        stats = self.address_stats(store)
+        fan_out = self._bursts(senders, timestamps)
+        fan_in = self._bursts(receivers, timestamps)
+        equal_outputs = self._equal_outputs(senders, values)
+        addresses = store.addresses
+        return {
+            "fan_out": [{"address": addresses[i], "count": c} for i, c in sorted(fan_out.items(), key=lambda x: -x[1])],
+            "fan_in": [{"address": addresses[i], "count": c} for i, c in sorted(fan_in.items(), key=lambda x: -x[1])],
+            "equal_outputs": [{"address": addresses[i], "value": v, "count": c}
+                              for i, v, c in sorted(equal_outputs, key=lambda x: -x[2])],
+            "peel_chains": sorted(self._peel_chains(store, stats), key=lambda c: -c["hops"]),
+        }
+
+# Per-Address Risk Scoring
+class RiskEngine:
+    """Per-address risk scores from one vectorised pass over a case's ``TransactionStore``.
+
+    Each feature is squashed to [0, 1] and combined with ``weights`` into a
+    0-100 score: reciprocal counterparties (bounces), transaction degree,
+    value velocity (percentile of value moved per active day), proximity to
+    mixers or flagged patterns, and watchlist hits. ``features`` keeps the
+    last feature arrays.
+    """
+    DEFAULT_WEIGHTS = {"bounce": 20, "degree": 15, "velocity": 20, "mixer_proximity": 20, "watchlist": 25}
+    WATCHLIST_LEVELS = {"high": 1.0, "medium": 0.6}
+
+    def __init__(self, weights=None):
+        self.weights = dict(self.DEFAULT_WEIGHTS if weights is None else weights)
+        self.features = {}
+
+    @instrumented("risk")
+    def score(self, case, mixers=(), patterns=None, watchlist_hits=None):
+        """Return ``{address: score}`` for every address in the case."""
+        store = case.store
+        patterns = patterns or {}
+        watchlist_hits = watchlist_hits or {}
+        n = len(store.addresses)
+        if not n:
+            return {}
+        senders, receivers, _, _ = PatternDetector.columns(store)
+        stats = PatternDetector().address_stats(store)
+
+        # Reciprocal counterparties: distinct pairs whose reverse pair also exists.
+        codes = np.unique(senders.astype(np.int64) * n + receivers)
+        pair_from, pair_to = codes // n, codes % n
+        reciprocal = np.isin(pair_to * n + pair_from, codes) & (pair_from != pair_to)
+        bounce = np.bincount(pair_from[reciprocal], minlength=n)
+
+        degree = stats["in_degree"] + stats["out_degree"]
+        span = np.where(np.isfinite(stats["first_seen"]), stats["last_seen"] - stats["first_seen"], 0.0)
+        velocity = (stats["value_in"] + stats["value_out"]) / np.maximum(span, 3600.0) * 86400.0
+        # Average ranks, so addresses with identical velocity share one percentile.
+        ordered = np.sort(velocity)
+        velocity_rank = (np.searchsorted(ordered, velocity, side="left")
+                         + np.searchsorted(ordered, velocity, side="right") - 1) / 2.0 / max(1, n - 1)
+
+        flagged = np.zeros(n, dtype=bool)
+        for address in itertools.chain(
+                mixers,
+                (finding["address"] for name in ("fan_out", "fan_in", "equal_outputs")
+                 for finding in patterns.get(name, [])),
+                (address for chain in patterns.get("peel_chains", []) for address in chain["addresses"])):
+            address_id = store.address_ids.get(address)
+            if address_id is not None:
+                flagged[address_id] = True
+        watchlist = np.zeros(n)
+        for address, label in watchlist_hits.items():
+            address_id = store.address_ids.get(address)
+            if address_id is not None:
+                level = str(label.get("risk_level", "")).lower()
+                watchlist[address_id] = self.WATCHLIST_LEVELS.get(level, 0.3)
+        mixer_proximity = self._proximity(flagged.astype(np.float64), senders, receivers)
+        watchlist = self._proximity(watchlist, senders, receivers)
+
+        self.features = {
+            "addresses": store.addresses,
+            "bounce": 1 - np.exp(-bounce / 2.0),
+            "degree": 1 - np.exp(-degree / 10.0),
+            "velocity": velocity_rank,
+            "mixer_proximity": mixer_proximity,
+            "watchlist": watchlist,
+        }
+        total = sum(self.weights.values()) or 1
+        scores = sum(self.weights[name] * self.features[name] for name in self.weights) * (100.0 / total)
+        return {address: round(float(value), 1) for address, value in zip(store.addresses, scores)}
+
+    @staticmethod
+    def _proximity(direct, senders, receivers):
+        """Direct values, plus half of the strongest direct value among each address's counterparties."""
+        neighbour = np.zeros(len(direct))
+        np.maximum.at(neighbour, receivers, direct[senders])
+        np.maximum.at(neighbour, senders, direct[receivers])
+        return np.maximum(direct, 0.5 * neighbour)
+
 # Address Clustering with Connected Components
 class AddressClusterAnalyzer:
     def __init__(self, investigator):
         self.investigator = investigator
 
+    @instrumented("clustering")
     def identify_clusters(self):
         """Identify clusters using weakly connected components."""
         clusters = {}
         if self.investigator.graph:
-            for i, component in enumerate(nx.weakly_connected_components(self.investigator.graph)):
+            if self.investigator.graph_backend == "csr":
+                components = self.investigator.csr_graph().weakly_connected_components()
+            else:
+                components = nx.weakly_connected_components(self.investigator.graph)
+            for i, component in enumerate(components):
                 clusters[f"Cluster_{i+1}"] = list(component)
         return clusters
 
+# Centrality Helpers
+BETWEENNESS_SAMPLE_SIZE = 256
+LARGE_GRAPH_NODES = 500
+
+def _betweenness_from_sources(graph, sources):
+    """Unnormalised betweenness contributions of shortest paths starting at ``sources``."""
+    return nx.betweenness_centrality_subset(graph, sources=sources, targets=list(graph.nodes), normalized=False)
+
+def parallel_betweenness_centrality(graph, k=None, workers=1, seed=42):
+    """Betweenness centrality from all sources, or ``k`` sampled pivots, over a process pool.
+
+    Normalised and scaled like ``networkx.betweenness_centrality(graph, k=k)``.
+    """
+    nodes = list(graph.nodes)
+    n = len(nodes)
+    if k is not None and k < n:
+        sources = random.Random(seed).sample(nodes, k)
+    else:
+        sources = nodes
+    if workers > 1 and len(sources) > workers:
+        chunks = [sources[i::workers] for i in range(workers)]
+        betweenness = dict.fromkeys(nodes, 0.0)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for partial in pool.map(_betweenness_from_sources, [graph] * len(chunks), chunks):
+                for node, value in partial.items():
+                    betweenness[node] += value
+    else:
+        betweenness = _betweenness_from_sources(graph, sources) if sources else {}
+
+    scale = n / len(sources) if sources and len(sources) < n else 1.0
+    if n > 2:
+        scale /= (n - 1) * (n - 2)
+    return {node: value * scale for node, value in betweenness.items()}
+
+def rank_wallets(metrics, key="betweenness_centrality", top_n=10):
+    """Top ``top_n`` ``(address, metrics)`` pairs ordered by ``key``."""
+    return heapq.nlargest(top_n, metrics.items(), key=lambda item: item[1][key])
+
 # Enhanced Visualization with Risk Scores
 class EnhancedGraphVisualizer:
-    def __init__(self, investigator):
+    def __init__(self, investigator, layout_cache_dir=".layout_cache"):
         self.investigator = investigator
-
-    def analyze_graph_metrics(self):
-        """Calculate centrality metrics for key wallet identification."""
+        self.layout_cache_dir = layout_cache_dir
+        self._metrics_cache = {}
+        self._layouts = {}
+
+    @instrumented("centrality")
+    def analyze_graph_metrics(self, mode="exact", k=None, workers=1, top_n=10, seed=42):
+        """Calculate centrality metrics for key wallet identification.
+
+        ``mode="approx"`` estimates betweenness from ``k`` sampled pivot sources
+        (default ``BETWEENNESS_SAMPLE_SIZE``) instead of all nodes. With
+        ``workers`` > 1 the sources are split across a process pool. Results are
+        memoised per graph version and parameters; only the ``top_n`` wallets
+        are printed.
+        """
+        if mode not in ("exact", "approx"):
+            raise ValueError(f"Unknown analytics mode: {mode}")
         graph = self.investigator.graph
-        degree_centrality = centrality.degree_centrality(graph)
-        betweenness_centrality = centrality.betweenness_centrality(graph)
-        closeness_centrality = centrality.closeness_centrality(graph)
-
-        print("\n=== Wallet Centrality Metrics ===")
-        for node in graph.nodes:
-            print(f"Wallet: {node}")
-            print(f"  Degree Centrality: {degree_centrality[node]:.4f}")
-            print(f"  Betweenness Centrality: {betweenness_centrality[node]:.4f}")
-            print(f"  Closeness Centrality: {closeness_centrality[node]:.4f}")
+        n = graph.number_of_nodes()
+        if mode == "approx":
+            k = min(n, k or BETWEENNESS_SAMPLE_SIZE)
+        else:
+            k = None
+        cache_key = (self.investigator.graph_version, self.investigator.graph_backend, k, seed)
+        if cache_key in self._metrics_cache:
+            return self._metrics_cache[cache_key]
+
+        if self.investigator.graph_backend == "csr":
+            csr = self.investigator.csr_graph()
+            degree_centrality = csr.degree_centrality()
+            closeness_centrality = csr.closeness_centrality()
+        else:
+            degree_centrality = centrality.degree_centrality(graph)
+            closeness_centrality = centrality.closeness_centrality(graph)
+        betweenness_centrality = parallel_betweenness_centrality(graph, k=k, workers=workers, seed=seed)
 
-        return {
+        metrics = {
             node: {
                 "degree_centrality": degree_centrality[node],
                 "betweenness_centrality": betweenness_centrality[node],
@@ -333,28 +2787,53 @@ class EnhancedGraphVisualizer:
             for node in graph.nodes
         }
 
+        label = "exact" if k is None or k == n else f"sampled, k={k}"
+        logger.info(f"\n=== Wallet Centrality Metrics (top {top_n} of {n} by betweenness, {label}) ===")
+        for node, node_metrics in rank_wallets(metrics, top_n=top_n):
+            logger.info(f"Wallet: {node}")
+            logger.info(f"  Degree Centrality: {node_metrics['degree_centrality']:.4f}")
+            logger.info(f"  Betweenness Centrality: {node_metrics['betweenness_centrality']:.4f}")
+            logger.info(f"  Closeness Centrality: {node_metrics['closeness_centrality']:.4f}")
+
+        self._metrics_cache = {cache_key: metrics}
+        return metrics
+
+    @instrumented("communities")
     def detect_communities(self):
         """Detect communities in the transaction graph."""
         graph = self.investigator.graph
         communities = list(greedy_modularity_communities(graph))
         
-        print("\n=== Detected Communities ===")
+        logger.info("\n=== Detected Communities ===")
         for i, community in enumerate(communities):
-            print(f"Community {i + 1}: {list(community)}")
+            logger.info(f"Community {i + 1}: {list(community)}")
         
         return communities
 
-    def visualize(self, save_as=None):
-        """Visualize transaction graph with nodes and edges, enhanced with metrics."""
+    @instrumented("visualisation")
+    def visualize(self, save_as=None, show=True, mode="auto", max_labels=25, dpi=300):
+        """Visualize transaction graph with nodes and edges, enhanced with metrics.
+
+        ``mode="large"`` (chosen automatically above ``LARGE_GRAPH_NODES``)
+        renders off-screen with a community-seeded layout, collapses each
+        community into a super-node and labels only the ``max_labels`` most
+        connected wallets. Layouts are cached in memory and under
+        ``layout_cache_dir``.
+        """
         graph = self.investigator.graph
 
         if not graph.nodes:
-            print("No nodes in the graph to visualize.")
+            logger.info("No nodes in the graph to visualize.")
             return
 
+        if mode == "auto":
+            mode = "large" if graph.number_of_nodes() > LARGE_GRAPH_NODES else "full"
+        if mode == "large":
+            return self._visualize_large(graph, save_as, max_labels, dpi)
+
         # Set up figure and axis
         fig, ax = plt.subplots(figsize=(14, 10))
-        pos = nx.spring_layout(graph, k=0.3)
+        pos = self._cached_layout(graph, "spring", lambda: nx.spring_layout(graph, k=0.3))
 
         # Draw nodes with different colors and sizes
         node_colors = [graph.degree(node) for node in graph]
@@ -379,29 +2858,193 @@ class EnhancedGraphVisualizer:
         plt.ylabel("Edge directions represent flow of funds", fontsize=10)
 
         if save_as:
-            plt.savefig(save_as, format='png', dpi=300)
-            print(f"Graph saved as {save_as}")
+            plt.savefig(save_as, format='png', dpi=dpi)
+            logger.info(f"Graph saved as {save_as}")
 
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
+        return save_as
+
+    def _layout_cache_path(self, graph, kind):
+        if not self.layout_cache_dir:
+            return None
+        digest = hashlib.sha1(kind.encode())
+        ids = {}
+        for node in graph.nodes:
+            ids[node] = len(ids)
+            digest.update(node.encode() if isinstance(node, str) else repr(node).encode())
+            digest.update(b"\0")
+        # The edge list, as sorted node-index pairs, so a rewired graph never reuses a stale layout.
+        pairs = np.array([(ids[u], ids[v]) for u, v in graph.edges], dtype=np.int64).reshape(-1, 2)
+        digest.update(np.unique(pairs, axis=0).tobytes())
+        return os.path.join(self.layout_cache_dir, f"{digest.hexdigest()}.pkl")
+
+    def _cached_layout(self, graph, kind, compute):
+        """Return a layout from memory, then disk, computing and storing it on a miss."""
+        key = (kind, self.investigator.graph_version)
+        if key in self._layouts:
+            return self._layouts[key]
+        path = self._layout_cache_path(graph, kind)
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                layout = pickle.load(f)
+        else:
+            layout = compute()
+            if path:
+                os.makedirs(self.layout_cache_dir, exist_ok=True)
+                with open(path, "wb") as f:
+                    pickle.dump(layout, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._layouts[key] = layout
+        return layout
+
+    def _community_layout(self, graph):
+        """Lay out the community quotient graph, then place members on a disc around each super-node."""
+        communities = [sorted(c, key=str) for c in
+                       nx.community.louvain_communities(graph.to_undirected(as_view=True), seed=42)]
+        membership = {node: i for i, members in enumerate(communities) for node in members}
+        quotient = nx.Graph()
+        quotient.add_nodes_from(range(len(communities)))
+        for u, v in graph.edges:
+            cu, cv = membership[u], membership[v]
+            if cu != cv:
+                weight = quotient.get_edge_data(cu, cv, {"weight": 0})["weight"]
+                quotient.add_edge(cu, cv, weight=weight + 1)
+        # Lay out each connected group of communities on its own, then shelf-pack
+        # the groups so isolated communities do not squeeze the rest.
+        groups = sorted(nx.connected_components(quotient),
+                        key=lambda group: -sum(len(communities[i]) for i in group))
+        spans = [max(0.1, math.sqrt(sum(len(communities[i]) for i in group) / graph.number_of_nodes()))
+                 for group in groups]
+        shelf_width = max(2 * spans[0], math.sqrt(sum((2 * span + 0.1) ** 2 for span in spans)))
+        centres = {}
+        x = y = row_height = 0.0
+        for group, span in zip(groups, spans):
+            size = 2 * span + 0.1
+            if x and x + size > shelf_width:
+                x, y, row_height = 0.0, y - row_height, 0.0
+            origin = np.array([x + size / 2, y - size / 2])
+            if len(group) > 1:
+                local = nx.spring_layout(quotient.subgraph(group), weight="weight", seed=42)
+            else:
+                local = {next(iter(group)): np.zeros(2)}
+            for i, xy in local.items():
+                centres[i] = origin + span * np.asarray(xy)
+            x += size
+            row_height = max(row_height, size)
+
+        rng = np.random.default_rng(42)
+        largest = max(len(members) for members in communities)
+        positions = {}
+        for i, members in enumerate(communities):
+            radius = 0.05 * math.sqrt(len(members) / largest)
+            angles = rng.uniform(0, 2 * math.pi, len(members))
+            radii = radius * np.sqrt(rng.uniform(0, 1, len(members)))
+            offsets = np.column_stack([np.cos(angles) * radii, np.sin(angles) * radii])
+            for node, offset in zip(members, offsets):
+                positions[node] = centres[i] + offset
+        return {"communities": communities, "centres": centres, "positions": positions}
+
+    def _visualize_large(self, graph, save_as, max_labels, dpi):
+        """Level-of-detail rendering: community super-nodes plus the most connected wallets."""
+        layout = self._cached_layout(graph, "community", lambda: self._community_layout(graph))
+        communities, centres, positions = layout["communities"], layout["centres"], layout["positions"]
+        membership = {node: i for i, members in enumerate(communities) for node in members}
+
+        fig = Figure(figsize=(14, 10))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+
+        weights = {}
+        for u, v in graph.edges:
+            cu, cv = membership[u], membership[v]
+            if cu != cv:
+                weights[(cu, cv)] = weights.get((cu, cv), 0) + 1
+        if weights:
+            segments = [(centres[cu], centres[cv]) for cu, cv in weights]
+            widths = 0.3 + 2.5 * np.log1p(list(weights.values())) / math.log1p(max(weights.values()))
+            ax.add_collection(LineCollection(segments, linewidths=widths, colors="grey", alpha=0.4, zorder=1))
+
+        sizes = np.array([len(members) for members in communities])
+        xy = np.array([centres[i] for i in range(len(communities))])
+        points = ax.scatter(xy[:, 0], xy[:, 1], s=60 + 1200 * sizes / sizes.max(), c=sizes,
+                            cmap=plt.cm.plasma, alpha=0.6, zorder=2)
+        fig.colorbar(points, ax=ax, fraction=0.05, pad=0.04).set_label("Wallets per Community")
+
+        top = heapq.nlargest(max_labels, graph.degree, key=lambda item: item[1])
+        if top:
+            top_xy = np.array([positions[node] for node, _ in top])
+            ax.scatter(top_xy[:, 0], top_xy[:, 1], s=25, c="black", zorder=3)
+            for (node, degree), (x, y) in zip(top, top_xy):
+                label = node if len(str(node)) <= 12 else f"{str(node)[:6]}...{str(node)[-4:]}"
+                ax.annotate(f"{label} ({degree})", (x, y), fontsize=7, xytext=(3, 3),
+                            textcoords="offset points", zorder=4)
+
+        ax.set_title(f"Transaction Network: {graph.number_of_nodes()} wallets in {len(communities)} communities",
+                     fontsize=16)
+        ax.set_xlabel("Super-nodes are communities; labelled points are the most connected wallets", fontsize=12)
+        ax.set_axis_off()
+        fig.tight_layout()
+        if save_as:
+            fig.savefig(save_as, format="png", dpi=dpi)
+            logger.info(f"Graph saved as {save_as}")
+        return save_as
 
 # Report Generation
+def _pdf_text(value):
+    """``value`` as text the core PDF fonts can encode; other characters become "?"."""
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+def _short_address(address):
+    """Shorten long addresses and hashes to ``abcdef...wxyz`` for table cells."""
+    return address if len(address) <= 14 else f"{address[:6]}...{address[-4:]}"
+
 class InvestigationReportGenerator:
-    def __init__(self, case, clusters, risk_scores, graph_metrics, communities, mixers):
+    def __init__(self, case, clusters, risk_scores, graph_metrics, communities, mixers, cycles=None,
+                 patterns=None, watchlist_hits=None, flows=None):
         self.case = case
+        self.watchlist_hits = watchlist_hits or {}
+        self.flows = flows or {}
+        self.cycles = cycles or []
+        self.patterns = patterns or {}
         self.clusters = clusters
         self.risk_scores = risk_scores
         self.graph_metrics = graph_metrics
         self.communities = communities
         self.mixers = mixers
 
-    def generate_report(self, graph_filename, filename=None):
+    TRANSACTION_FIELDS = ("txid", "from", "to", "value", "value_usd", "value_inr", "timestamp", "block",
+                          "fee", "token_transfer", "confirmations", "crypto_type", "nonce")
+    METRIC_FIELDS = ("address", "degree_centrality", "betweenness_centrality", "closeness_centrality")
+
+    @instrumented("report")
+    def generate_report(self, graph_filename, filename=None, top_n=25, appendix_format="csv", embed_appendix=True):
+        """Write a compact PDF with top-N tables plus full-data appendix files next to it.
+
+        Every transaction and every node's metrics are streamed to
+        ``<report>_transactions.<fmt>`` and ``<report>_metrics.<fmt>``
+        (``appendix_format`` is "csv" or "jsonl") and, when fpdf supports it,
+        embedded in the PDF as attachments. Returns the report filename.
+        """
+        if appendix_format not in ("csv", "jsonl"):
+            raise ValueError(f"Unsupported appendix format: {appendix_format}")
         if filename is None:
-            crypto_type = self.case.transaction_data[0]["crypto_type"] if self.case.transaction_data else "Unknown"
+            crypto_type = self.case.transaction_data[0]["crypto_type"] if len(self.case.transaction_data) else "Unknown"
             wallet_address = self.case.suspected_addresses[0][:6] + "..." + self.case.suspected_addresses[0][-4:]
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"investigation_report_{crypto_type}_{wallet_address}_{timestamp}.pdf"
-        
+
+        self.case.convert_values_to_fiat()
+        base = os.path.splitext(filename)[0]
+        transactions_file = self._write_appendix(
+            f"{base}_transactions.{appendix_format}", self.TRANSACTION_FIELDS,
+            self.case.transaction_data.iter_records())
+        metrics_file = self._write_appendix(
+            f"{base}_metrics.{appendix_format}", self.METRIC_FIELDS,
+            ({"address": node, **metrics} for node, metrics in self.graph_metrics.items()))
+
         pdf = FPDF()
         pdf.add_page()
 
@@ -421,124 +3064,462 @@ class InvestigationReportGenerator:
             "It includes details about transactions, clusters of linked addresses, and a risk assessment score "
             "to help determine the likelihood of criminal activity."
         ))
+        pdf.multi_cell(200, 6, (
+            f"Traced {len(self.case.transaction_data)} transactions across {len(self.graph_metrics)} wallets. "
+            f"Tables list the top {top_n} entries; complete data is in {os.path.basename(transactions_file)} "
+            f"and {os.path.basename(metrics_file)}."
+        ))
 
         pdf.ln(10)
 
-        risk_factor = self.case.calculate_risk_factor()
+        suspect = self.case.suspected_addresses[0] if self.case.suspected_addresses else ""
+        if suspect not in self.risk_scores:
+            suspect = suspect.lower()
+        if suspect in self.risk_scores:
+            risk_factor = self.risk_scores[suspect]
+            basis = ("This score combines reciprocal transfers (bounces), transaction degree, value velocity, "
+                     "proximity to mixers or flagged patterns, and watchlist hits. "
+                     "A higher score may indicate suspicious activity.")
+        else:
+            risk_factor = self.case.calculate_risk_factor()
+            basis = ("This score is calculated based on the bounce count (number of times funds were moved back "
+                     "and forth) and the number of transactions. A higher score may indicate suspicious activity.")
         pdf.set_font("helvetica", "B", 12)
         pdf.cell(200, 10, "Risk Assessment", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         pdf.set_font("helvetica", "", 10)
-        pdf.multi_cell(200, 10, (
-            f"The risk factor for this wallet address is: {risk_factor}%. "
-            "This score is calculated based on the bounce count (number of times funds were moved back and forth) "
-            "and the number of transactions. A higher score may indicate suspicious activity."
-        ))
+        pdf.multi_cell(200, 10, f"The risk factor for this wallet address is: {risk_factor}%. {basis}")
+        if self.risk_scores:
+            pdf.ln(2)
+            self._table(pdf, ("Highest-Risk Addresses", "Score"), (160, 30), (
+                (address, f"{score:.1f}")
+                for address, score in heapq.nlargest(top_n, self.risk_scores.items(), key=lambda item: item[1])))
 
         pdf.ln(10)
 
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(200, 10, "Mixers/Tumblers Detected", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.set_font("helvetica", "", 10)
+        self._section(pdf, f"Watchlist Hits ({len(self.watchlist_hits)})")
+        if not self.watchlist_hits:
+            pdf.cell(200, 10, "No traced address matched a watchlist.", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        else:
+            self._table(pdf, ("Address", "Owner", "Risk", "Entity"), (90, 45, 25, 30), (
+                (address, label.get("owner"), label.get("risk_level"), label.get("entity_type"))
+                for address, label in itertools.islice(self.watchlist_hits.items(), top_n)))
+
+        pdf.ln(10)
+
+        self._section(pdf, f"Mixers/Tumblers Detected ({len(self.mixers)})")
         if not self.mixers:
             pdf.cell(200, 10, "No potential mixers/tumblers detected.", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         else:
-            for mixer in self.mixers:
-                pdf.cell(200, 10, f"Potential Mixer Address: {mixer}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            self._table(pdf, ("Potential Mixer Address",), (190,),
+                        ((mixer,) for mixer in itertools.islice(self.mixers, top_n)))
 
         pdf.ln(10)
 
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(200, 10, "Clusters Identified", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.set_font("helvetica", "", 10)
-        for cluster_id, addresses in self.clusters.items():
-            pdf.cell(200, 10, f"{cluster_id}: {', '.join(addresses[:5])}...", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self._section(pdf, f"Circular Flows Detected ({len(self.cycles)})")
+        if not self.cycles:
+            pdf.cell(200, 10, "No circular flows detected.", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        else:
+            self._table(pdf, ("Hops", "Route"), (15, 175), (
+                (cycle["length"], " -> ".join(_short_address(a) for a in cycle["addresses"] + cycle["addresses"][:1]))
+                for cycle in itertools.islice(self.cycles, top_n)))
 
         pdf.ln(10)
 
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(200, 10, "Centrality Metrics (Key Players)", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.set_font("helvetica", "", 10)
-        for node, metrics in self.graph_metrics.items():
-            pdf.multi_cell(200, 10, f"Address: {node}\n"
-                                     f"  Degree Centrality: {metrics['degree_centrality']:.4f}\n"
-                                     f"  Betweenness Centrality: {metrics['betweenness_centrality']:.4f}\n"
-                                     f"  Closeness Centrality: {metrics['closeness_centrality']:.4f}\n"
-                                     "-----------------------------------------------\n"
-            )
+        if self.flows:
+            self._section(pdf, f"Fund Flows ({sum(map(len, self.flows.values()))} paths)")
+            self._table(pdf, ("Target", "Hops", "Amount", "Route"), (35, 15, 30, 110), (
+                (_short_address(target), flow["hops"], f"{flow['amount']:g}",
+                 " -> ".join(_short_address(a) for a in flow["addresses"]))
+                for target, paths in self.flows.items() for flow in paths[:top_n]))
+            unreached = [target for target, paths in self.flows.items() if not paths]
+            if unreached:
+                pdf.multi_cell(190, 8, _pdf_text("No flow found to: " + ", ".join(unreached)))
+            pdf.ln(10)
+
+        self._section(pdf, "Transaction Patterns")
+        rows = itertools.chain(
+            (("Fan-out burst", f["address"], f"{f['count']} payments") for f in self.patterns.get("fan_out", [])[:top_n]),
+            (("Fan-in burst", f["address"], f"{f['count']} deposits") for f in self.patterns.get("fan_in", [])[:top_n]),
+            (("Equal outputs", f["address"], f"{f['count']} x {f['value']:g}")
+             for f in self.patterns.get("equal_outputs", [])[:top_n]),
+            ((f"Peel chain ({c['hops']} hops)", c["addresses"][0], f"ends at {_short_address(c['addresses'][-1])}")
+             for c in self.patterns.get("peel_chains", [])[:top_n]),
+        )
+        if not self._table(pdf, ("Pattern", "Address", "Detail"), (40, 100, 50), rows):
+            pdf.cell(200, 10, "No fan-out, fan-in, equal-output or peel-chain patterns detected.",
+                     new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
         pdf.ln(10)
 
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(200, 10, "Communities Detected", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.set_font("helvetica", "", 10)
-        for i, community in enumerate(self.communities):
-            pdf.cell(200, 10, f"Community {i + 1}: {', '.join(list(community)[:5])}...", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self._section(pdf, f"Clusters Identified ({len(self.clusters)}, largest {top_n})")
+        largest = heapq.nlargest(top_n, self.clusters.items(), key=lambda item: len(item[1]))
+        self._table(pdf, ("Cluster", "Size", "Sample Addresses"), (30, 20, 140), (
+            (cluster_id, len(addresses), ", ".join(_short_address(a) for a in addresses[:4]))
+            for cluster_id, addresses in largest))
 
         pdf.ln(10)
 
-        pdf.set_font("helvetica", "B", 12)
-        pdf.cell(200, 10, "Transaction Details", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.set_font("helvetica", "", 10)
-        for tx in self.case.transaction_data:
-            pdf.multi_cell(200, 10, f"Transaction ID: {tx['txid']}\n"
-                                     f"From: {tx['from']}\n"
-                                     f"To: {tx['to']}\n"
-                                     f"Value (in original crypto): {tx['value']}\n"
-                                     f"Value in USD: {tx['value_usd']}\n"
-                                     f"Value in INR: {tx['value_inr']}\n"
-                                     f"Timestamp: {tx['timestamp']}\n"
-                                     f"Block: {tx['block']}\n"
-                                     f"Token Transfer: {tx['token_transfer']}\n"
-                                     f"Confirmations: {tx['confirmations']}\n"
-                                     "-----------------------------------------------\n"
-            )
+        self._section(pdf, f"Centrality Metrics (Key Players, top {top_n} by betweenness)")
+        self._table(pdf, ("Address", "Degree", "Betweenness", "Closeness"), (100, 30, 30, 30), (
+            (node, f"{m['degree_centrality']:.4f}", f"{m['betweenness_centrality']:.4f}", f"{m['closeness_centrality']:.4f}")
+            for node, m in rank_wallets(self.graph_metrics, top_n=top_n)))
+
+        pdf.ln(10)
+
+        self._section(pdf, f"Communities Detected ({len(self.communities)}, largest {top_n})")
+        communities = heapq.nlargest(top_n, enumerate(self.communities), key=lambda item: len(item[1]))
+        self._table(pdf, ("Community", "Size", "Sample Addresses"), (30, 20, 140), (
+            (f"Community {i + 1}", len(community), ", ".join(_short_address(a) for a in itertools.islice(community, 4)))
+            for i, community in communities))
+
+        pdf.ln(10)
+
+        self._section(pdf, f"Largest Transactions (top {top_n} of {len(self.case.transaction_data)})")
+        store = self.case.store
+        top_indices = heapq.nlargest(top_n, range(len(store)), key=store.values.__getitem__)
+        self._table(pdf, ("Transaction ID", "From", "To", "Value", "USD"), (40, 45, 45, 35, 25), (
+            (_short_address(tx["txid"] or ""), _short_address(tx["from"]), _short_address(tx["to"]),
+             f"{tx['value']:g}", "" if tx["value_usd"] is None else f"{tx['value_usd']:,.2f}")
+            for tx in (store.record(i, include_details=False) for i in top_indices)))
 
         pdf.add_page()
         pdf.image(graph_filename, x=10, y=10, w=190)
 
+        if embed_appendix and hasattr(pdf, "embed_file"):
+            for path in (transactions_file, metrics_file):
+                pdf.embed_file(path, desc=f"Full {os.path.basename(path)} data", compress=True)
+
         pdf.output(filename)
-        print(f"Report saved as {filename}")
+        logger.info(f"Report saved as {filename}")
+        return filename
+
+    @staticmethod
+    def _section(pdf, title):
+        pdf.set_font("helvetica", "B", 12)
+        pdf.cell(200, 10, title, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.set_font("helvetica", "", 10)
+
+    @staticmethod
+    def _table(pdf, headers, widths, rows):
+        """Draw a fixed-width table from a row iterator; returns the number of rows drawn."""
+        count = 0
+        for row in rows:
+            if not count:
+                pdf.set_font("helvetica", "B", 8)
+                for header, width in zip(headers, widths):
+                    pdf.cell(width, 6, header, border=1)
+                pdf.ln(6)
+                pdf.set_font("helvetica", "", 8)
+            for value, width in zip(row, widths):
+                text = _pdf_text(value)
+                while len(text) > 3 and pdf.get_string_width(text) > width - 2:
+                    text = text[:-4] + "..."
+                pdf.cell(width, 6, text, border=1)
+            pdf.ln(6)
+            count += 1
+        pdf.set_font("helvetica", "", 10)
+        return count
+
+    @staticmethod
+    def _write_appendix(path, fields, rows):
+        """Stream ``rows`` (dicts) to a CSV or JSON-lines file without holding them in memory."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    f.write(json.dumps({field: row.get(field) for field in fields}) + "\n")
+        return path
+
+# Non-Interactive Batch Investigation
+_batch_apis = {}
+_batch_prices = {}
+
+def _init_batch_worker(options):
+    """Process-pool initializer: each worker owns its transport and cache connection."""
+    workers = max(1, options["workers"])
+    # Every worker gets an equal share of each provider's rate limit, so the
+    # pool as a whole stays under the provider ceiling.
+    rate_limits = {provider: rate / workers for provider, rate in PROVIDER_RATE_LIMITS.items()}
+    configure_logging(options["log_level"] or "WARNING", options["log_format"])
+    PipelineMetrics.install(PipelineMetrics(profile=bool(options["profile"]), trace_memory=options["trace_memory"]))
+    transport = HTTPTransport(rate_limits=rate_limits)
+    cache = ResponseCache(options["cache_path"])
+    _batch_prices["table"] = PriceTable(options["prices_path"], transport=transport)
+    _batch_apis["bitcoin"] = BitcoinAPI(cache, transport)
+    if options["etherscan_key"]:
+        _batch_apis["ethereum"] = EthereumAPI(options["etherscan_key"], cache, transport)
+
+def _case_id(address):
+    """File-safe case id; characters outside an address's alphabet cannot reach the output paths."""
+    return re.sub(r"[^A-Za-z0-9]", "_", f"{identify_blockchain(address) or 'unknown'}_{address}")
+
+def investigate_address(address, options):
+    """Run the full pipeline for one address and write ``<output_dir>/<case_id>.json``."""
+    started = time.monotonic()
+    metrics = PipelineMetrics.shared()
+    metrics.reset()
+    blockchain = identify_blockchain(address)
+    case_id = _case_id(address)
+    result = {"case_id": case_id, "address": address, "blockchain": blockchain,
+              "depth": options["depth"], "limit": options["limit"], "status": "ok"}
+    try:
+        api = _batch_apis.get(blockchain)
+        if blockchain is None:
+            raise ValueError("Unsupported blockchain address format.")
+        if api is None:
+            raise ValueError(f"No API configured for {blockchain} (pass --etherscan-key).")
+
+        investigator = CryptoInvestigator(api, KYCAMLData(options["watchlist"]), graph_backend="csr")
+        snapshot = CaseSnapshot(os.path.join(options["snapshots"], case_id)) if options["snapshots"] else None
+        if snapshot is not None and snapshot.exists():
+            case = snapshot.restore(investigator, api.get_exchange_rates(), _batch_prices.get("table"))
+        else:
+            case = InvestigationCase(case_id, [address], api.get_exchange_rates(),
+                                     price_table=_batch_prices.get("table"))
+        scheduler = TraceScheduler(options["priority"], options["max_api_calls"], options["max_nodes"],
+                                   options["max_seconds"],
+                                   checkpoint_path=os.path.join(options["output_dir"], f"{case_id}.ckpt"))
+        investigator.trace_transactions(address, case, depth=options["depth"], limit=options["limit"],
+                                        workers=options["trace_workers"], scheduler=scheduler, progress=False,
+                                        incremental=snapshot is not None and snapshot.exists())
+        # An unfinished trace resumes from its checkpoint; the snapshot only takes finished ones.
+        if snapshot is not None and not scheduler.pending():
+            result["snapshot"] = {"path": snapshot.path, "previous_transactions": len(snapshot)}
+            snapshot.save(case, investigator)
+        mixers = investigator.detect_mixers_or_tumblers()
+        cycles = investigator.detect_circular_transactions()
+        patterns = PatternDetector().detect(case.store)
+        watchlist_hits = investigator.screen_watchlists()
+        clusters = AddressClusterAnalyzer(investigator).identify_clusters()
+        visualizer = EnhancedGraphVisualizer(investigator)
+        graph_metrics = visualizer.analyze_graph_metrics(mode=options["analytics"]) if investigator.graph else {}
+        communities = visualizer.detect_communities() if investigator.graph else []
+        risk_scores = RiskEngine().score(case, mixers, patterns, watchlist_hits)
+        risk_score = risk_scores.get(address, risk_scores.get(address.lower(), 0.0))
+        flows = investigator.trace_fund_flows(case, address, options["flow_to"] or (), max_hops=options["max_hops"])
+
+        report = None
+        if options["pdf"] and investigator.graph:
+            base = os.path.join(options["output_dir"], case_id)
+            visualizer.visualize(save_as=f"{base}.png", show=False, mode="large", dpi=150)
+            report = InvestigationReportGenerator(case, clusters, risk_scores, graph_metrics,
+                                                  communities, mixers, cycles, patterns, watchlist_hits, flows
+                                                  ).generate_report(f"{base}.png", filename=f"{base}.pdf")
+
+        result.update({
+            "transactions": len(case.transaction_data),
+            "wallets": investigator.graph.number_of_nodes(),
+            "risk_score": risk_score,
+            "highest_risk": [{"address": a, "score": v} for a, v in
+                             heapq.nlargest(25, risk_scores.items(), key=lambda item: item[1])],
+            "mixers": mixers,
+            "watchlist_hits": watchlist_hits,
+            "circular_flows": cycles,
+            "fund_flows": flows,
+            "patterns": patterns,
+            "clusters": sorted((len(members) for members in clusters.values()), reverse=True),
+            "communities": sorted((len(members) for members in communities), reverse=True),
+            "top_wallets": [{"address": node, **metrics} for node, metrics in rank_wallets(graph_metrics, top_n=25)],
+            "report": report,
+        })
+    except Exception as e:
+        result.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    result["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    result["metrics"] = metrics.snapshot()
+    if options["profile"]:
+        os.makedirs(options["profile"], exist_ok=True)
+        metrics.write_profile(os.path.join(options["profile"], f"{case_id}.prof"))
+
+    with open(os.path.join(options["output_dir"], f"{case_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, default=str)
+    return result
+
+def _read_addresses(source):
+    """Unique, valid, non-comment addresses from a file path or ``-`` for stdin."""
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        seen = set()
+        for number, line in enumerate(stream, 1):
+            address = line.split("#", 1)[0].strip()
+            if address and identify_blockchain(address) is None:
+                logger.warning(f"Skipping line {number}: {address!r} is not a Bitcoin or Ethereum address.")
+                continue
+            key = address.lower() if address.startswith("0x") else address
+            if address and key not in seen:
+                seen.add(key)
+                yield address
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def _batch_result_ok(output_dir, address):
+    path = os.path.join(output_dir, f"{_case_id(address)}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+def run_batch(options):
+    """Investigate every address from ``options["batch"]`` on a process pool; returns the results."""
+    os.makedirs(options["output_dir"], exist_ok=True)
+    addresses = list(_read_addresses(options["batch"]))
+    if not options["force"]:
+        done = {a for a in addresses if _batch_result_ok(options["output_dir"], a)}
+        if done:
+            logger.info(f"Skipping {len(done)} addresses with existing results (use --force to redo).")
+        addresses = [a for a in addresses if a not in done]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_batch_worker,
+                             initargs=(options,)) as pool:
+        futures = {pool.submit(investigate_address, address, options): address for address in addresses}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Investigations", unit="case"):
+            try:
+                result = future.result()
+            except Exception as e:
+                # A worker that died outside investigate_address must not abort the remaining cases.
+                result = {"address": futures[future], "status": "error", "error": f"{type(e).__name__}: {e}"}
+            results.append(result)
+            if result["status"] != "ok":
+                logger.error(f"{result['address']}: {result['error']}")
+    ok = sum(1 for result in results if result["status"] == "ok")
+    if options["metrics"]:
+        combined = PipelineMetrics()
+        for result in results:
+            combined.merge(result.get("metrics", {}))
+        combined.write(options["metrics"])
+    logger.info(f"Batch complete: {ok}/{len(results)} cases succeeded; results in {options['output_dir']}")
+    return results
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Trace and analyse Bitcoin/Ethereum addresses. "
+                                                 "Runs interactively unless --batch is given.")
+    parser.add_argument("--batch", metavar="FILE", help="file with one address per line, or - for stdin")
+    parser.add_argument("--depth", type=int, default=2, help="tracing depth (default: 2)")
+    parser.add_argument("--limit", type=int, default=20, help="transactions fetched per address (default: 20)")
+    parser.add_argument("--priority", choices=TraceScheduler.PRIORITIES, default="fifo",
+                        help="frontier order: breadth-first, largest transfers or newest first (default: fifo)")
+    parser.add_argument("--max-api-calls", type=int, metavar="N", help="stop each trace after N address lookups")
+    parser.add_argument("--max-nodes", type=int, metavar="N", help="stop each trace once the graph has N wallets")
+    parser.add_argument("--max-seconds", type=float, metavar="S", help="stop each trace after S seconds")
+    parser.add_argument("--output-dir", default="investigations", help="directory for per-case results")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel investigations")
+    parser.add_argument("--trace-workers", type=int, default=4, help="concurrent address lookups per case")
+    parser.add_argument("--etherscan-key", default=os.environ.get("ETHERSCAN_API_KEY"),
+                        help="Etherscan API key (default: $ETHERSCAN_API_KEY)")
+    parser.add_argument("--cache-path", default="bitEthTool_cache.sqlite", help="shared response cache file")
+    parser.add_argument("--prices-path", default="bitEthTool_prices.sqlite", help="shared historical price table")
+    parser.add_argument("--watchlist", metavar="DIR", help="watchlist index directory to screen traced addresses")
+    parser.add_argument("--build-watchlist", nargs="+", metavar="CSV",
+                        help="build the --watchlist index from attribution CSVs and exit")
+    parser.add_argument("--analytics", choices=("exact", "approx"), default="approx",
+                        help="centrality computation mode (default: approx)")
+    parser.add_argument("--pdf", action="store_true", help="also render a graph PNG and PDF report per case")
+    parser.add_argument("--force", action="store_true", help="re-run addresses that already have results")
+    parser.add_argument("--flow-to", nargs="+", metavar="ADDRESS",
+                        help="report time-respecting fund-flow paths from each investigated address to these")
+    parser.add_argument("--max-hops", type=int, default=4, help="longest fund-flow path to search (default: 4)")
+    parser.add_argument("--snapshots", metavar="DIR",
+                        help="keep per-case snapshots here and re-sync existing ones with only new activity")
+    parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="log verbosity (default: INFO, WARNING inside batch workers)")
+    parser.add_argument("--log-format", choices=("text", "json"), default="text", help="log record format")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write per-stage metrics as Prometheus text (.prom/.txt) or JSON (anything else)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write cProfile statistics to PATH (a directory of per-case files in batch mode)")
+    parser.add_argument("--trace-memory", action="store_true", help="record peak memory per stage with tracemalloc")
+    return parser
 
 # Main function to use the above classes
 if __name__ == "__main__":
-    address = input("Enter the address to investigate: ")
-    blockchain = identify_blockchain(address)
-    if not blockchain:
-        print("Unsupported blockchain address format.")
+    parser = build_arg_parser()
+    args = parser.parse_args()
+    configure_logging(args.log_level or "INFO", args.log_format)
+    metrics = PipelineMetrics.install(PipelineMetrics(profile=bool(args.profile) and not args.batch,
+                                                      trace_memory=args.trace_memory))
+    if args.build_watchlist:
+        if not args.watchlist:
+            parser.error("--build-watchlist needs --watchlist DIR for the output index")
+        index = WatchlistIndex.build(args.build_watchlist, args.watchlist)
+        logger.info(f"Watchlist index with {len(index)} addresses written to {args.watchlist}")
+    elif args.batch:
+        run_batch(vars(args))
     else:
-        api = None
-        if blockchain == "bitcoin":
-            api = BitcoinAPI()
-        elif blockchain == "ethereum":
-            api_key = input("Enter your Etherscan API key: ")
-            api = EthereumAPI(api_key)
-
-        if api:
-            exchange_rates = api.get_exchange_rates()
-            case_id = "001"
-            suspected_addresses = [address]
-            case = InvestigationCase(case_id, suspected_addresses, exchange_rates)
-
-            kyc_aml_data = KYCAMLData()
-            investigator = CryptoInvestigator(api, kyc_aml_data)
-            tracing_depth = int(input("Enter the tracing depth (recommended 1-3): "))
-            limit = int(input("Enter the number of transactions to trace: "))
-            investigator.trace_transactions(address, case, depth=tracing_depth, limit=limit)
-
-            # Detect mixers/tumblers
-            mixers = investigator.detect_mixers_or_tumblers()
-
-            cluster_analyzer = AddressClusterAnalyzer(investigator)
-            clusters = cluster_analyzer.identify_clusters()
-
-            risk_scores = {addr: case.calculate_risk_factor() for addr in case.history}
-
-            visualizer = EnhancedGraphVisualizer(investigator)
-            graph_filename = f"graph_{blockchain}_{address[:6]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            visualizer.visualize(save_as=graph_filename)
-
-            graph_metrics = visualizer.analyze_graph_metrics()
-            communities = visualizer.detect_communities()
-
-            report_generator = InvestigationReportGenerator(case, clusters, risk_scores, graph_metrics, communities, mixers)
-            report_generator.generate_report(graph_filename)
\ No newline at end of file
+        address = input("Enter the address to investigate: ")
+        blockchain = identify_blockchain(address)
+        if not blockchain:
+            logger.error("Unsupported blockchain address format.")
+        else:
+            api = None
+            cache = ResponseCache()
+            if blockchain == "bitcoin":
+                api = BitcoinAPI(cache)
+            elif blockchain == "ethereum":
+                api_key = input("Enter your Etherscan API key: ")
+                api = EthereumAPI(api_key, cache)
+
+            if api:
+                exchange_rates = api.get_exchange_rates()
+                case_id = "001"
+                suspected_addresses = [address]
+                kyc_aml_data = KYCAMLData(args.watchlist)
+                investigator = CryptoInvestigator(api, kyc_aml_data)
+                price_table = PriceTable(transport=api.transport)
+                snapshot = CaseSnapshot(os.path.join(args.snapshots, f"{blockchain}_{address}")) if args.snapshots else None
+                resync = snapshot is not None and snapshot.exists()
+                if resync:
+                    case = snapshot.restore(investigator, exchange_rates, price_table)
+                    logger.info(f"Re-syncing snapshot {snapshot.path} ({len(snapshot)} transactions).")
+                else:
+                    case = InvestigationCase(case_id, suspected_addresses, exchange_rates, price_table=price_table)
+
+                tracing_depth = int(input("Enter the tracing depth (recommended 1-3): "))
+                limit = int(input("Enter the number of transactions to trace: "))
+                scheduler = TraceScheduler(args.priority, args.max_api_calls, args.max_nodes, args.max_seconds,
+                                           checkpoint_path=f"trace_checkpoint_{blockchain}_{address}.pkl")
+                investigator.trace_transactions(address, case, depth=tracing_depth, limit=limit, workers=4,
+                                                scheduler=scheduler, incremental=resync)
+                if snapshot is not None and scheduler.pending():
+                    logger.warning(f"Snapshot {snapshot.path} not updated; rerun to finish the trace from "
+                                   f"{scheduler.checkpoint_path} first.")
+                elif snapshot is not None:
+                    snapshot.save(case, investigator)
+
+                # Detect mixers/tumblers and circular flows
+                mixers = investigator.detect_mixers_or_tumblers()
+                cycles = investigator.detect_circular_transactions()
+                patterns = PatternDetector().detect(case.store)
+                watchlist_hits = investigator.screen_watchlists()
+
+                cluster_analyzer = AddressClusterAnalyzer(investigator)
+                clusters = cluster_analyzer.identify_clusters()
+
+                risk_scores = RiskEngine().score(case, mixers, patterns, watchlist_hits)
+                flows = investigator.trace_fund_flows(case, address, args.flow_to or (), max_hops=args.max_hops)
+
+                visualizer = EnhancedGraphVisualizer(investigator)
+                graph_filename = f"graph_{blockchain}_{address[:6]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+                visualizer.visualize(save_as=graph_filename)
+
+                graph_metrics = visualizer.analyze_graph_metrics(workers=os.cpu_count() or 1)
+                communities = visualizer.detect_communities()
+
+                report_generator = InvestigationReportGenerator(case, clusters, risk_scores, graph_metrics, communities, mixers,
+                                                                cycles, patterns, watchlist_hits, flows)
+                report_generator.generate_report(graph_filename)
+
+                for provider, stats in api.transport.stats().items():
+                    logger.info(f"{provider}: {stats['requests']} requests, {stats['retries']} retries, "
+                                f"avg latency {stats['latency_avg']:.3f}s")
+                for stage, stats in metrics.snapshot()["stages"].items():
+                    logger.info(f"{stage}: {stats['wall_seconds']:.2f}s wall, {stats['cpu_seconds']:.2f}s CPU",
+                                extra={"stage": stage, **stats})
+                if args.metrics:
+                    metrics.write(args.metrics)
+                if args.profile:
+                    metrics.write_profile(args.profile)
\ No newline at end of file
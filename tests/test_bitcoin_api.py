@@ -0,0 +1,126 @@
+import random
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import bitEthTool
+
+
+def transaction(i, inputs, outputs, block=None):
+    return {"hash": f"tx{i}", "time": 1_600_000_000 + 60 * i, "block_height": 700_000 + i if block is None else block,
+            "fee": 1000, "inputs": [{"prev_out": {"addr": a, "value": v}} if a else {} for a, v in inputs],
+            "out": [{"addr": a, "value": v} for a, v in outputs]}
+
+
+class FakeBlockchainInfo(bitEthTool.BitcoinAPI):
+    """Serves rawaddr and multiaddr payloads from an in-memory list of transactions."""
+    def __init__(self, transactions):
+        super().__init__()
+        self.transactions = transactions
+        self.requests = []
+
+    def touches(self, tx, address):
+        inputs, outputs = self._sides(tx)
+        return address in inputs or address in outputs
+
+    def _get_json(self, url, endpoint=None, key=None, ttl=None, cacheable=None):
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        if endpoint == "rawaddr":
+            address = parsed.path.rsplit("/", 1)[-1]
+            self.requests.append(("rawaddr", address))
+            rows = [tx for tx in reversed(self.transactions) if self.touches(tx, address)]
+            offset, limit = int(query["offset"][0]), int(query["limit"][0])
+            return {"n_tx": len(rows), "txs": rows[offset:offset + limit]}
+        active = query["active"][0].split("|")
+        self.requests.append(("multiaddr", tuple(active)))
+        rows = [tx for tx in reversed(self.transactions) if any(self.touches(tx, a) for a in active)]
+        return {"addresses": [{"address": a, "n_tx": sum(self.touches(tx, a) for tx in self.transactions)}
+                              for a in active],
+                "txs": rows[:int(query["n"][0])]}
+
+
+def hashes(results):
+    return [None if txs is None else [tx["hash"] for tx in txs] for txs in results]
+
+
+def test_extract_edges_splits_outputs_by_input_share():
+    api = FakeBlockchainInfo([])
+    tx = transaction(0, [("1A", 300), ("1B", 100)], [("1C", 200), ("1D", 120)])
+    edges = sorted(api.extract_edges(tx))
+    assert edges == [("1A", "1C", 150.0), ("1A", "1D", 90.0), ("1B", "1C", 50.0), ("1B", "1D", 30.0)]
+    assert sum(value for _, to_addr, value in edges if to_addr == "1C") == 200
+
+
+def test_extract_edges_skips_change_outputs():
+    api = FakeBlockchainInfo([])
+    tx = transaction(0, [("1A", 100), ("1A", 50)], [("1B", 90), ("1A", 55)])
+    assert api.extract_edges(tx) == [("1A", "1B", 90.0)]
+
+
+def test_coinbase_transactions_have_no_edges():
+    api = FakeBlockchainInfo([])
+    coinbase = transaction(0, [(None, 0)], [("1Miner", 625_000_000)])
+    assert api.extract_edges(coinbase) == []
+
+
+def random_ledger(addresses=30, transactions=300, seed=2):
+    rng = random.Random(seed)
+    names = [f"1Addr{i:028d}" for i in range(addresses)]
+    ledger = [transaction(i, [(a, rng.randint(1, 10 ** 8)) for a in rng.sample(names, rng.randint(1, 3))],
+                          [(a, rng.randint(1, 10 ** 8)) for a in rng.sample(names, rng.randint(1, 3))])
+              for i in range(transactions)]
+    return names, ledger
+
+
+@pytest.mark.parametrize("limit", [3, 10, 50])
+@pytest.mark.parametrize("since", [None, 700_200])
+def test_batched_lookups_match_rawaddr(limit, since):
+    names, ledger = random_ledger()
+    api = FakeBlockchainInfo(ledger)
+    addresses = names[:20]
+    since_blocks = {address: since for address in addresses} if since is not None else None
+    batched = api.get_addresses_info(addresses, limit, since_blocks)
+    assert hashes(batched) == hashes(api.get_address_info(a, limit, since_block=since) for a in addresses)
+    if since is not None:
+        assert all(tx["block_height"] > since for txs in batched for tx in txs)
+
+
+def test_truncated_multiaddr_page_falls_back_to_rawaddr():
+    busy, quiet = "1Busy" + "0" * 28, "1Quiet" + "0" * 27
+    ledger = [transaction(0, [("1Other" + "0" * 27, 5)], [(quiet, 5)])]
+    ledger += [transaction(i, [("1Other" + "0" * 27, 5)], [(busy, 5)]) for i in range(1, 40)]
+    api = FakeBlockchainInfo(ledger)
+    results = api.get_addresses_info([busy, quiet], 10)
+    assert hashes(results) == [[f"tx{i}" for i in range(39, 29, -1)], ["tx0"]]
+    assert api.requests == [("multiaddr", (busy, quiet)), ("rawaddr", quiet)]
+
+
+def test_since_blocks_stop_fallback_at_synced_history():
+    busy, quiet = "1Busy" + "0" * 28, "1Quiet" + "0" * 27
+    ledger = [transaction(0, [("1Other" + "0" * 27, 5)], [(quiet, 5)])]
+    ledger += [transaction(i, [("1Other" + "0" * 27, 5)], [(busy, 5), (quiet, 1)] if i in (30, 38) else [(busy, 5)])
+               for i in range(1, 40)]
+    api = FakeBlockchainInfo(ledger)
+    results = api.get_addresses_info([busy, quiet], 10, since_blocks={busy: 700_035, quiet: 700_030})
+    assert hashes(results) == [["tx39", "tx38", "tx37", "tx36"], ["tx38"]]
+    # The quiet address's synced transaction is inside the page, so rawaddr is not needed.
+    assert api.requests == [("multiaddr", (busy, quiet))]
+
+
+def test_trace_builds_the_same_graph_with_and_without_batching():
+    names, ledger = random_ledger(addresses=60, transactions=400)
+    graphs = []
+    for batch_size in (1, bitEthTool.BitcoinAPI.batch_size):
+        api = FakeBlockchainInfo(ledger)
+        api.batch_size = batch_size
+        investigator = bitEthTool.CryptoInvestigator(api, None)
+        case = bitEthTool.InvestigationCase("case", [names[0]], None)
+        investigator.trace_transactions(names[0], case, depth=2, limit=10, progress=False)
+        # Each transaction is recorded once, as one row per input-to-output edge.
+        by_hash = {tx["hash"]: tx for tx in ledger}
+        for txid in set(case.store.txids):
+            assert case.store.txids.count(txid) == len(api.extract_edges(by_hash[txid]))
+        graphs.append((sorted(investigator.graph.edges()), len(api.requests)))
+    assert graphs[0][0] == graphs[1][0]
+    assert graphs[1][1] < graphs[0][1]
@@ -0,0 +1,164 @@
+import json
+import random
+
+import pytest
+
+import bitEthTool
+
+SUSPECT = "0x" + "0" * 40
+
+
+class LedgerAPI(bitEthTool.BlockchainAPI):
+    """In-memory Etherscan-shaped ledger; ``grow`` mines more transactions into later blocks."""
+    max_page_size = 50
+
+    def __init__(self, supports_start_block, addresses=60, transactions=400, seed=1):
+        super().__init__()
+        self.supports_start_block = supports_start_block
+        self.rng = random.Random(seed)
+        self.addresses = addresses
+        self.transactions = []
+        self.calls = 0
+        self.grow(transactions)
+
+    def grow(self, count):
+        for _ in range(count):
+            i = len(self.transactions)
+            self.transactions.append({
+                "hash": f"0x{i:064x}",
+                "from": f"0x{self.rng.randrange(self.addresses):040x}",
+                "to": f"0x{self.rng.randrange(self.addresses):040x}",
+                "value": str(self.rng.randrange(10 ** 20)),
+                "timeStamp": str(1_600_000_000 + 60 * i),
+                "blockNumber": str(1000 + i),
+            })
+
+    def get_address_page(self, address, page_number, page_size, start_block=0):
+        self.calls += 1
+        rows = [tx for tx in reversed(self.transactions)
+                if address in (tx["from"], tx["to"]) and int(tx["blockNumber"]) >= start_block]
+        return rows[page_number * page_size:(page_number + 1) * page_size]
+
+
+def trace(api, case=None, investigator=None, incremental=False):
+    investigator = investigator or bitEthTool.CryptoInvestigator(api, None)
+    case = case or bitEthTool.InvestigationCase("case", [SUSPECT], None)
+    investigator.trace_transactions(SUSPECT, case, depth=2, limit=1000, progress=False, incremental=incremental)
+    return case, investigator
+
+
+def edge_data(graph):
+    return sorted((u, v, data["count"], data["total_value"]) for u, v, data in graph.edges(data=True))
+
+
+def test_restore_reproduces_case_and_investigator(tmp_path):
+    api = LedgerAPI(supports_start_block=True)
+    case, investigator = trace(api)
+    bitEthTool.CaseSnapshot(str(tmp_path)).save(case, investigator)
+
+    snapshot = bitEthTool.CaseSnapshot(str(tmp_path))
+    restored_investigator = bitEthTool.CryptoInvestigator(api, None)
+    restored = snapshot.restore(restored_investigator)
+    assert len(snapshot) == len(case.store)
+    assert list(restored.store.iter_records()) == list(case.store.iter_records())
+    assert dict(restored.history.items()) == dict(case.history.items())
+    assert edge_data(restored_investigator.graph) == edge_data(investigator.graph)
+    assert restored_investigator.sync_state == investigator.sync_state
+    assert restored_investigator.detect_circular_transactions() == investigator.detect_circular_transactions()
+
+
+def test_restore_keeps_exact_wei_values(tmp_path):
+    case = bitEthTool.InvestigationCase("case", [SUSPECT], None)
+    case.add_transaction("0xa", "0xb", "t1", {"value": "1234567890123456789", "timeStamp": "1600000000"})
+    case.add_transaction("0xb", "0xc", "t2", {"value": "1000", "timeStamp": "1600000001"})
+    bitEthTool.CaseSnapshot(str(tmp_path)).save(case)
+    restored = bitEthTool.CaseSnapshot(str(tmp_path)).restore()
+    assert [record["value"] for record in restored.store] == [1234567890123456789, 1000]
+
+
+@pytest.mark.parametrize("supports_start_block", [True, False])
+def test_incremental_resync_matches_full_trace(tmp_path, supports_start_block):
+    api = LedgerAPI(supports_start_block)
+    case, investigator = trace(api)
+    bitEthTool.CaseSnapshot(str(tmp_path)).save(case, investigator)
+    api.grow(60)
+
+    snapshot = bitEthTool.CaseSnapshot(str(tmp_path))
+    resynced_investigator = bitEthTool.CryptoInvestigator(api, None)
+    resynced = snapshot.restore(resynced_investigator)
+    api.calls = 0
+    trace(api, resynced, resynced_investigator, incremental=True)
+    incremental_calls = api.calls
+
+    api.calls = 0
+    fresh, fresh_investigator = trace(api)
+    assert sorted(resynced.store.txids) == sorted(fresh.store.txids)
+    assert set(resynced_investigator.graph.edges) == set(fresh_investigator.graph.edges)
+    assert incremental_calls <= api.calls
+
+    # Saving the re-synced case appends only the new rows.
+    previous = len(snapshot)
+    snapshot.save(resynced, resynced_investigator)
+    reloaded = bitEthTool.CaseSnapshot(str(tmp_path))
+    assert reloaded.meta["generation"] == 0
+    assert len(reloaded) == len(resynced.store) > previous
+    assert list(reloaded.restore().store.iter_records()) == list(resynced.store.iter_records())
+
+
+def test_interrupted_rewrite_keeps_previous_snapshot(tmp_path, monkeypatch):
+    api = LedgerAPI(supports_start_block=True)
+    case, investigator = trace(api)
+    bitEthTool.CaseSnapshot(str(tmp_path)).save(case, investigator)
+
+    other = bitEthTool.InvestigationCase("other", [SUSPECT], None)
+    other.add_transaction("0xa", "0xb", "t1", {"value": "1", "timeStamp": "1600000000"})
+
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(json, "dump", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        bitEthTool.CaseSnapshot(str(tmp_path)).save(other)
+    monkeypatch.undo()
+
+    restored = bitEthTool.CaseSnapshot(str(tmp_path)).restore()
+    assert restored.case_id == "case"
+    assert list(restored.store.iter_records()) == list(case.store.iter_records())
+
+    bitEthTool.CaseSnapshot(str(tmp_path)).save(other)
+    snapshot = bitEthTool.CaseSnapshot(str(tmp_path))
+    assert snapshot.meta["generation"] == 1
+    assert [record["txid"] for record in snapshot.restore().store] == ["t1"]
+    assert not (tmp_path / "values.bin").exists()
+
+
+def test_budget_stopped_batch_case_resumes_before_snapshotting(tmp_path, monkeypatch):
+    api = LedgerAPI(supports_start_block=True)
+    api.get_exchange_rates = lambda: None
+    monkeypatch.setitem(bitEthTool._batch_apis, "ethereum", api)
+    monkeypatch.setitem(bitEthTool._batch_prices, "table", None)
+    arguments = ["--output-dir", str(tmp_path / "out"), "--snapshots", str(tmp_path / "snapshots"),
+                 "--depth", "2", "--limit", "1000"]
+    (tmp_path / "out").mkdir()
+
+    def investigate(*extra):
+        options = vars(bitEthTool.build_arg_parser().parse_args(arguments + list(extra)))
+        return bitEthTool.investigate_address(SUSPECT, options)
+
+    stopped = investigate("--max-api-calls", "3")
+    assert stopped["status"] == "ok"
+    assert "snapshot" not in stopped
+    assert list((tmp_path / "out").glob("*.ckpt"))
+
+    resumed = investigate()
+    assert resumed["status"] == "ok"
+    assert resumed["snapshot"]["previous_transactions"] == 0
+    assert not list((tmp_path / "out").glob("*.ckpt"))
+
+    fresh, _ = trace(api)
+    assert resumed["transactions"] == len(fresh.store)
+
+    api.grow(40)
+    resynced = investigate()
+    assert resynced["status"] == "ok"
+    assert resynced["snapshot"]["previous_transactions"] == len(fresh.store)
+    assert resynced["transactions"] == len(trace(api)[0].store)
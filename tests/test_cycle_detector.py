@@ -0,0 +1,82 @@
+import random
+
+import networkx as nx
+import pytest
+
+import bitEthTool
+
+
+def canonical(addresses):
+    """Rotate a cycle so it starts at its smallest address."""
+    pivot = addresses.index(min(addresses))
+    return tuple(addresses[pivot:] + addresses[:pivot])
+
+
+@pytest.mark.parametrize("max_length", [2, 3, 5])
+@pytest.mark.parametrize("seed", range(5))
+def test_cycles_match_simple_cycles(seed, max_length):
+    rng = random.Random(seed)
+    detector = bitEthTool.CycleDetector(max_length=max_length)
+    graph = nx.DiGraph()
+    for i in range(120):
+        from_addr, to_addr = f"a{rng.randrange(30)}", f"a{rng.randrange(30)}"
+        if from_addr == to_addr:
+            continue
+        detector.add_edge(from_addr, to_addr, f"t{i}", timestamp=float(i), value=1.0)
+        graph.add_edge(from_addr, to_addr)
+    found = [canonical(cycle["addresses"]) for cycle in detector.cycles]
+    assert len(found) == len(set(found))
+    assert set(found) == {canonical(cycle) for cycle in nx.simple_cycles(graph, length_bound=max_length)}
+    for cycle in detector.cycles:
+        assert cycle["length"] == len(cycle["addresses"]) == len(cycle["txids"])
+
+
+def test_time_window_requires_time_respecting_cycle():
+    detector = bitEthTool.CycleDetector(time_window=100)
+    detector.add_edge("a", "b", "t1", timestamp=10.0)
+    detector.add_edge("b", "c", "t2", timestamp=5.0)
+    assert detector.add_edge("c", "a", "t3", timestamp=20.0) == []
+    # A later b -> c transfer makes a -> b -> c -> a time-respecting.
+    cycle, = detector.add_edge("b", "c", "t4", timestamp=15.0)
+    assert cycle["addresses"] == ["a", "b", "c"]
+    assert cycle["txids"] == ["t1", "t4", "t3"]
+    assert (cycle["start_time"], cycle["end_time"]) == (10.0, 20.0)
+
+
+def test_time_window_bounds_cycle_span():
+    detector = bitEthTool.CycleDetector(time_window=100)
+    detector.add_edge("a", "b", "t1", timestamp=10.0)
+    assert detector.add_edge("b", "a", "t2", timestamp=500.0) == []
+    cycle, = detector.add_edge("b", "a", "t3", timestamp=50.0)
+    assert cycle["txids"] == ["t1", "t3"]
+
+
+def test_time_window_tries_later_first_hop_transfers():
+    detector = bitEthTool.CycleDetector(time_window=100)
+    detector.add_edge("a", "b", "t1", timestamp=0.0)
+    detector.add_edge("a", "b", "t2", timestamp=90.0)
+    cycle, = detector.add_edge("b", "a", "t3", timestamp=150.0)
+    assert cycle["txids"] == ["t2", "t3"]
+    assert (cycle["start_time"], cycle["end_time"]) == (90.0, 150.0)
+
+
+def test_value_tolerance_filters_hops():
+    detector = bitEthTool.CycleDetector(value_tolerance=0.1)
+    detector.add_edge("a", "b", "t1", value=100.0)
+    assert detector.add_edge("b", "a", "t2", value=50.0) == []
+    cycle, = detector.add_edge("b", "a", "t3", value=95.0)
+    assert cycle["values"] == [100.0, 95.0]
+
+
+def test_rebuild_matches_incremental_index():
+    rng = random.Random(7)
+    case = bitEthTool.InvestigationCase("cycles", ["a0"], None)
+    incremental = bitEthTool.CycleDetector(max_length=4)
+    for i in range(200):
+        from_addr, to_addr = f"a{rng.randrange(25)}", f"a{rng.randrange(25)}"
+        timestamp = 1_600_000_000 + i
+        case.add_transaction(from_addr, to_addr, f"t{i}", {"value": "1", "timeStamp": timestamp})
+        incremental.add_edge(from_addr, to_addr, f"t{i}", timestamp=float(timestamp), value=1.0)
+    rebuilt = bitEthTool.CycleDetector(max_length=4)
+    rebuilt.rebuild(case.store)
+    assert rebuilt.cycles == incremental.cycles
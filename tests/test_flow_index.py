@@ -0,0 +1,119 @@
+import random
+
+import networkx as nx
+import pytest
+
+import bitEthTool
+
+
+def random_case(nodes, transactions, seed):
+    """A case with random transfers (5% without a timestamp) and the matching DiGraph."""
+    rng = random.Random(seed)
+    case = bitEthTool.InvestigationCase("flows", ["a0"], None)
+    graph = nx.DiGraph()
+    for i in range(transactions):
+        from_addr, to_addr = f"a{rng.randrange(nodes)}", f"a{rng.randrange(nodes)}"
+        if from_addr == to_addr:
+            continue
+        timestamp = None if rng.random() < 0.05 else 1_600_000_000 + rng.randrange(10_000)
+        case.add_transaction(from_addr, to_addr, f"t{i}", {"value": str(rng.randrange(1, 100)), "timeStamp": timestamp})
+        graph.add_edge(from_addr, to_addr)
+    return case, graph
+
+
+def address_pairs(graph, count, seed):
+    rng = random.Random(seed)
+    nodes = sorted(graph.nodes)
+    return [(rng.choice(nodes), rng.choice(nodes)) for _ in range(count)]
+
+
+@pytest.fixture(params=["scipy", "networkx"])
+def csgraph_backend(request, monkeypatch):
+    """Run each test with SciPy's csgraph and with the NetworkX fallback."""
+    if request.param == "networkx":
+        monkeypatch.setattr(bitEthTool, "csgraph", None)
+    elif bitEthTool.csgraph is None:
+        pytest.skip("SciPy is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_shortest_path_matches_networkx(csgraph_backend, seed):
+    case, graph = random_case(80, 200, seed)
+    index = bitEthTool.FlowIndex(case.store)
+    for source, target in address_pairs(graph, 100, seed):
+        path = index.shortest_path(source, target)
+        if not nx.has_path(graph, source, target):
+            assert path is None
+            assert not index.reachable(source, target)
+            continue
+        hops = nx.shortest_path_length(graph, source, target)
+        assert path[0] == source and path[-1] == target
+        assert len(path) - 1 == hops
+        assert all(graph.has_edge(u, v) for u, v in zip(path, path[1:]))
+        assert index.reachable(source, target, max_hops=hops)
+        if hops > 1:
+            assert not index.reachable(source, target, max_hops=hops - 1)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_paths_match_all_simple_paths(csgraph_backend, seed):
+    case, graph = random_case(80, 200, seed)
+    index = bitEthTool.FlowIndex(case.store)
+    for source, target in address_pairs(graph, 100, seed):
+        if source == target:
+            assert index.paths(source, target) == []
+            continue
+        found = index.paths(source, target, max_hops=4, max_paths=10 ** 6, time_respecting=False)
+        expected = nx.all_simple_paths(graph, source, target, cutoff=4)
+        assert sorted(flow["addresses"] for flow in found) == sorted(expected)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_time_respecting_paths_are_ordered_subset(seed):
+    case, graph = random_case(80, 200, seed)
+    index = bitEthTool.FlowIndex(case.store)
+    for source, target in address_pairs(graph, 100, seed):
+        if source == target:
+            continue
+        unordered = {tuple(flow["addresses"]) for flow in
+                     index.paths(source, target, max_hops=4, max_paths=10 ** 6, time_respecting=False)}
+        for flow in index.paths(source, target, max_hops=4, max_paths=10 ** 6):
+            assert tuple(flow["addresses"]) in unordered
+            times = [step["earliest_timestamp"] for step in flow["steps"] if step["earliest_timestamp"] is not None]
+            assert times == sorted(times)
+            assert flow["amount"] == min(step["amount"] for step in flow["steps"])
+
+
+def test_max_paths_keeps_largest_amounts():
+    case = bitEthTool.InvestigationCase("flows", ["S"], None)
+    for i, (from_addr, to_addr, value) in enumerate([("S", "A", 1000), ("A", "T", 1), ("S", "B", 10), ("B", "T", 10)]):
+        case.add_transaction(from_addr, to_addr, f"t{i}", {"value": str(value), "timeStamp": 1_600_000_000 + i})
+    index = bitEthTool.FlowIndex(case.store)
+    best, = index.paths("S", "T", max_paths=1)
+    assert (best["addresses"], best["amount"]) == (["S", "B", "T"], 10.0)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_truncated_paths_are_top_of_full_enumeration(seed):
+    case, graph = random_case(40, 200, seed)
+    index = bitEthTool.FlowIndex(case.store)
+    for source, target in address_pairs(graph, 50, seed):
+        if source == target:
+            continue
+        every = index.paths(source, target, max_hops=4, max_paths=10 ** 6)
+        top = index.paths(source, target, max_hops=4, max_paths=5)
+        assert [flow["amount"] for flow in top] == [flow["amount"] for flow in every[:5]]
+        assert all(top[i]["amount"] >= top[i + 1]["amount"] for i in range(len(top) - 1))
+
+
+def test_edge_aggregates_parallel_transfers():
+    case = bitEthTool.InvestigationCase("flows", ["a"], None)
+    for i, (value, timestamp) in enumerate([(5, 300), (7, 100), (11, None)]):
+        case.add_transaction("a", "b", f"t{i}", {"value": str(value), "timeStamp": timestamp})
+    case.add_transaction("b", "a", "t3", {"value": "1", "timeStamp": 200})
+    index = bitEthTool.FlowIndex(case.store)
+    assert index.edge("a", "b") == {"count": 3, "total_value": 23.0, "first_timestamp": 100.0,
+                                    "last_timestamp": 300.0}
+    assert index.edge("a", "unknown") is None
+    assert index.shortest_path("a", "a") == ["a"]
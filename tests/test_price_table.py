@@ -0,0 +1,82 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import bitEthTool
+
+DAY = 86400
+EPOCH = 1_600_000_000 // DAY * DAY
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return json.loads(json.dumps(self.payload))
+
+
+class DailyPrices:
+    """CoinGecko-shaped transport with one price per day at midnight, priced ``1000 + day``."""
+    def __init__(self, last_day=None):
+        self.last_day = last_day
+        self.requests = []
+
+    def get(self, provider, url):
+        query = parse_qs(urlparse(url).query)
+        start, end = int(query["from"][0]), int(query["to"][0])
+        self.requests.append((start, end))
+        days = range(-(-start // DAY), end // DAY + 1)
+        if self.last_day is not None:
+            days = [day for day in days if day * DAY <= self.last_day]
+        return Response({"prices": [[day * DAY * 1000, 1000.0 + day - EPOCH // DAY] for day in days]})
+
+
+def table(tmp_path, transport):
+    return bitEthTool.PriceTable(str(tmp_path / "prices.sqlite"), transport=transport)
+
+
+def test_lookup_never_uses_later_or_stale_prices(tmp_path):
+    prices = table(tmp_path, DailyPrices())
+    prices.fill("Bitcoin", "usd", EPOCH, EPOCH + 2 * DAY)
+    result = prices.lookup("Bitcoin", "usd", [EPOCH - 10 * DAY, EPOCH, EPOCH + DAY + 13 * 3600, np.nan])
+    assert np.isnan(result[0]) and np.isnan(result[3])
+    assert list(result[1:3]) == [1000.0, 1001.0]
+
+
+def test_fill_covers_earliest_timestamp(tmp_path):
+    prices = table(tmp_path, DailyPrices())
+    timestamp = EPOCH + 13 * 3600
+    prices.fill("Bitcoin", "usd", timestamp, timestamp)
+    assert list(prices.lookup("Bitcoin", "usd", [timestamp])) == [1000.0]
+
+
+def test_records_sharing_one_timestamp_get_historical_prices(tmp_path):
+    case = bitEthTool.InvestigationCase("case", ["0xa"], {"usd": {"value": 99999.0}},
+                                        price_table=table(tmp_path, DailyPrices()))
+    for i in range(3):
+        case.add_transaction("0xa", "0xb", f"t{i}", {"value": str(10 ** 18), "timeStamp": str(EPOCH + 13 * 3600)})
+    case.convert_values_to_fiat()
+    assert [record["value_usd"] for record in case.store] == [1000.0] * 3
+
+
+def test_coverage_only_records_returned_samples(tmp_path):
+    transport = DailyPrices(last_day=EPOCH + DAY)
+    prices = table(tmp_path, transport)
+    prices.fill("Bitcoin", "usd", EPOCH, EPOCH + 5 * DAY)
+    assert np.isnan(prices.lookup("Bitcoin", "usd", [EPOCH + 5 * DAY])[0])
+
+    # Days that were missing are requested again once the provider has them.
+    transport.last_day = None
+    requests = len(transport.requests)
+    prices.fill("Bitcoin", "usd", EPOCH, EPOCH + 5 * DAY)
+    assert len(transport.requests) == requests + 1
+    assert transport.requests[-1][0] > EPOCH + DAY
+    assert list(prices.lookup("Bitcoin", "usd", [EPOCH + 5 * DAY])) == [1005.0]
+
+    # A fully covered range is not requested again.
+    prices.fill("Bitcoin", "usd", EPOCH, EPOCH + 5 * DAY)
+    assert len(transport.requests) == requests + 1
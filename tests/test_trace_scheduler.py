@@ -0,0 +1,46 @@
+import pytest
+
+import bitEthTool
+
+
+class GraphAPI(bitEthTool.BlockchainAPI):
+    """Serves a fixed list of ``(from, to, value, timestamp)`` transfers, newest first per address."""
+    def __init__(self, transfers):
+        super().__init__()
+        self.transactions = [{"hash": f"t{i}", "from": f, "to": t, "value": str(value), "timeStamp": str(timestamp),
+                              "blockNumber": str(100 + i)}
+                             for i, (f, t, value, timestamp) in enumerate(transfers)]
+        self.fetched = []
+
+    def get_address_page(self, address, page_number, page_size):
+        self.fetched.append(address)
+        rows = sorted((tx for tx in self.transactions if address in (tx["from"], tx["to"])),
+                      key=lambda tx: -int(tx["timeStamp"]))
+        return rows[page_number * page_size:(page_number + 1) * page_size]
+
+
+# B -> A is both the largest and the newest transfer, so value and recency
+# orders reach A at depth 2 before its depth-1 entry from R.
+TRANSFERS = [("R", "A", 1, 1), ("R", "B", 100, 2), ("B", "A", 1000, 5), ("A", "C", 5, 3), ("C", "D", 5, 4)]
+
+
+@pytest.mark.parametrize("priority", bitEthTool.TraceScheduler.PRIORITIES)
+def test_address_reached_shallower_later_is_expanded_again(priority):
+    api = GraphAPI(TRANSFERS)
+    investigator = bitEthTool.CryptoInvestigator(api, None)
+    case = bitEthTool.InvestigationCase("case", ["R"], None)
+    scheduler = bitEthTool.TraceScheduler(priority)
+    investigator.trace_transactions("R", case, depth=2, limit=10, scheduler=scheduler, progress=False)
+    assert "C" in api.fetched
+    assert investigator.graph.has_edge("C", "D")
+    assert scheduler.visited == {"R": 0, "A": 1, "B": 1, "C": 2}
+    assert sorted(case.store.txids) == ["t0", "t1", "t2", "t3", "t4"]
+
+
+def test_pop_batch_skips_entries_no_shallower_than_expanded():
+    scheduler = bitEthTool.TraceScheduler("value")
+    scheduler.push("A", 2, value=10)
+    scheduler.push("A", 1, value=1)
+    scheduler.push("A", 2, value=0)
+    assert [entry[3] for entry in scheduler.pop_batch(10)] == [2, 1]
+    assert scheduler.visited == {"A": 1}